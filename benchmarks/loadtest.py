@@ -0,0 +1,286 @@
+"""
+Load test of the test project's views, with and without patching
+
+    python -m benchmarks.loadtest --threads 8 --requests 4000
+    python -m benchmarks.loadtest --tasks 8 --requests 4000
+
+Requests go through Django's full request handling in-process, from several
+threads at once (via DRF's test client) or from several asyncio tasks (via
+Django's async test client, so through the ASGI handler). The same views are
+served unpatched and then patched, so the difference is the overhead of
+permission checking under concurrency, including any contention on locks or the
+GIL. The default path and role are granted in both runs, so both take the same
+code path apart from the permission checks.
+
+Each run gets its own process. Patching happens when the app is loaded, so the
+unpatched run is the one without the app in INSTALLED_APPS.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+
+DEFAULT_URLCONF = 'tests.test_patching_views.test_patching_rest'
+DEFAULT_PATHS = ['/rest_class_viewset']  # Granted to admins
+DEFAULT_ROLE = 'admin'
+WARMUP_REQUESTS = 50  # Per thread or task, before timing starts
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+force_user = None  # User of requests made by run_tasks, see force_authentication
+
+
+def configure(urlconf=DEFAULT_URLCONF, patched=True):
+    """
+    Configure Django like the test suite does
+
+    Args:
+        patched(bool): Install the app, which patches the views on startup
+    """
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        REST_FRAMEWORK_ROLES={'ROLES': 'tests.conftest.ROLES'},
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        SECRET_KEY='not very secret in benchmarks',
+        ROOT_URLCONF=urlconf,
+        ALLOWED_HOSTS=['testserver'],
+        MIDDLEWARE=[f'{__name__}.force_authentication'],  # This module, also when run as __main__
+        INSTALLED_APPS=(
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ) + (('rest_framework_roles',) if patched else ()),
+    )
+    django.setup()
+
+
+def force_authentication(get_response):
+    """
+    Middleware authenticating requests as force_user, like APIClient.force_authenticate
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            if force_user is not None:
+                request._force_auth_user = force_user
+            return await get_response(request)
+    else:
+        def middleware(request):
+            if force_user is not None:
+                request._force_auth_user = force_user
+            return get_response(request)
+    return middleware
+
+
+force_authentication.sync_capable = force_authentication.async_capable = True  # Like sync_and_async_middleware
+
+
+def make_user(role=DEFAULT_ROLE):
+    """
+    Unsaved user for given role, so no request touches the database
+    """
+    from django.contrib.auth.models import AnonymousUser, User
+
+    if role == 'anon':
+        return AnonymousUser()
+    return User(id=1, username='loadtest', is_superuser=role == 'admin', is_staff=role == 'admin')
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of already sorted values
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, elapsed, statuses):
+    """
+    Throughput in requests per second and latency percentiles in milliseconds
+    """
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'mean': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'statuses': dict(statuses),
+    }
+
+
+def run(paths, user, threads, requests):
+    """
+    Send requests to paths round-robin from several threads at once
+
+    Args:
+        requests(int): Total requests, split between threads
+    """
+    from rest_framework.test import APIClient
+
+    per_thread = max(1, requests // threads)
+    barrier = threading.Barrier(threads + 1)
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    errors = []
+
+    def worker():
+        try:
+            client = APIClient()
+            client.force_authenticate(user)
+            for i in range(WARMUP_REQUESTS):
+                client.get(paths[i % len(paths)])
+            local_latencies = []
+            local_statuses = Counter()
+            barrier.wait()
+            for i in range(per_thread):
+                start = time.perf_counter()
+                response = client.get(paths[i % len(paths)])
+                local_latencies.append(time.perf_counter() - start)
+                local_statuses[response.status_code] += 1
+        except Exception as e:
+            errors.append(e)
+            barrier.abort()  # Don't leave the others waiting
+            return
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    start = time.perf_counter()  # Workers are released as soon as this thread arrives
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    for thread in workers:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return summarize(latencies, time.perf_counter() - start, statuses)
+
+
+def run_tasks(paths, user, tasks, requests):
+    """
+    Send requests to paths round-robin from several asyncio tasks at once
+
+    Args:
+        requests(int): Total requests, split between tasks
+    """
+    from django.test import AsyncClient
+
+    global force_user
+    force_user = user
+    per_task = max(1, requests // tasks)
+    latencies = []
+    statuses = Counter()
+
+    async def task(client):
+        for i in range(per_task):
+            start = time.perf_counter()
+            response = await client.get(paths[i % len(paths)])
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    async def load():
+        clients = [AsyncClient() for _ in range(tasks)]
+        await asyncio.gather(*(
+            client.get(paths[i % len(paths)]) for client in clients for i in range(WARMUP_REQUESTS)
+        ))
+        start = time.perf_counter()
+        await asyncio.gather(*(task(client) for client in clients))
+        return time.perf_counter() - start
+
+    try:
+        elapsed = asyncio.run(load())
+    finally:
+        force_user = None
+    return summarize(latencies, elapsed, statuses)
+
+
+def compare(paths, role, threads, requests, urlconf=DEFAULT_URLCONF, tasks=None):
+    """
+    Run the load once unpatched and once patched, each in a fresh process
+
+    Args:
+        tasks(int): Run this many asyncio tasks instead of threads
+    """
+    results = {}
+    for scenario in ('unpatched', 'patched'):
+        cmd = [
+            sys.executable, '-m', 'benchmarks.loadtest', '--json',
+            '--scenario', scenario,
+            *(('--tasks', str(tasks)) if tasks else ('--threads', str(threads))),
+            '--requests', str(requests),
+            '--role', role,
+            '--urlconf', urlconf,
+        ]
+        for path in paths:
+            cmd += ['--path', path]
+        output = subprocess.run(cmd, cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+        results[scenario] = json.loads(output)
+    return results
+
+
+def report(results, out=sys.stdout):
+    columns = ('throughput', 'mean', 'p50', 'p95', 'p99')
+    print(f"{'':<10}{'req/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses", file=out)
+    for name, result in results.items():
+        values = ''.join(f"{result[column]:>10.1f}" if column == 'throughput' else f"{result[column]:>10.3f}" for column in columns)
+        print(f"{name:<10}{values}  {result['statuses']}", file=out)
+    if 'unpatched' not in results or 'patched' not in results:
+        return
+    unpatched, patched = results['unpatched'], results['patched']
+    if unpatched['statuses'] != patched['statuses']:
+        print("\nstatuses differ, so the runs took different code paths and overhead isn't comparable", file=out)
+        return
+    if unpatched['p50']:
+        overhead = (patched['p50'] - unpatched['p50']) / unpatched['p50'] * 100
+        print(f"\noverhead at p50: {patched['p50'] - unpatched['p50']:.3f} ms ({overhead:+.1f}%)", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    concurrency = parser.add_mutually_exclusive_group()
+    concurrency.add_argument('--threads', type=int, default=4)
+    concurrency.add_argument('--tasks', type=int, help="use this many asyncio tasks instead of threads")
+    parser.add_argument('--requests', type=int, default=2000, help="total requests per run")
+    parser.add_argument('--path', action='append', dest='paths', help=f"path to request, may be repeated (default: {DEFAULT_PATHS})")
+    parser.add_argument('--role', choices=('admin', 'user', 'anon'), default=DEFAULT_ROLE)
+    parser.add_argument('--urlconf', default=DEFAULT_URLCONF)
+    parser.add_argument('--scenario', choices=('unpatched', 'patched'), help="do a single run in this process")
+    parser.add_argument('--json', action='store_true', help="print the result of a single run as JSON")
+    args = parser.parse_args(argv)
+    paths = args.paths or DEFAULT_PATHS
+
+    if not args.scenario:
+        report(compare(paths, args.role, args.threads, args.requests, args.urlconf, args.tasks))
+        return
+
+    configure(args.urlconf, patched=args.scenario == 'patched')
+    if args.tasks:
+        result = run_tasks(paths, make_user(args.role), args.tasks, args.requests)
+    else:
+        result = run(paths, make_user(args.role), args.threads, args.requests)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        report({args.scenario: result})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Memory of forked workers, with and without freezing after patching
+
+    python -m benchmarks.memory --workers 4 --requests 500
+
+Like gunicorn with preload_app, the app is loaded and patched once and then
+workers are forked from it. Each worker serves requests and runs a full garbage
+collection, then reports its unique memory (USS): the pages it no longer shares
+with the others. The same is done without and with patching.freeze(gc_freeze=True)
+before forking, each in its own process.
+
+Needs Linux, since memory is read from /proc/self/smaps_rollup.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.loadtest import DEFAULT_PATHS, DEFAULT_URLCONF, REPO_ROOT, configure, make_user, run
+
+
+SMAPS = '/proc/self/smaps_rollup'
+
+
+def parse_uss(smaps):
+    """
+    Unique memory in KiB from the contents of smaps_rollup
+    """
+    uss = 0
+    for line in smaps.splitlines():
+        field, _, value = line.partition(':')
+        if field in ('Private_Clean', 'Private_Dirty'):
+            uss += int(value.split()[0])
+    return uss
+
+
+def uss():
+    with open(SMAPS) as f:
+        return parse_uss(f.read())
+
+
+def worker(paths, user, requests, out):
+    """
+    Serve requests in a forked worker and write its memory to file descriptor out
+    """
+    after_fork = uss()
+    run(paths, user, 1, requests)
+    gc.collect()
+    os.write(out, json.dumps({'after_fork': after_fork, 'after_requests': uss()}).encode())
+
+
+def fork_workers(paths, user, workers, requests):
+    """
+    Fork workers from this process and collect their memory in KiB
+    """
+    results = []
+    for _ in range(workers):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            status = 0
+            try:
+                worker(paths, user, requests, write_end)
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+        os.close(write_end)
+        with os.fdopen(read_end) as f:
+            output = f.read()
+        _, status = os.waitpid(pid, 0)
+        if status != 0:
+            raise RuntimeError(f"Worker {pid} failed with status {status}")
+        results.append(json.loads(output))
+    return results
+
+
+def summarize(results):
+    return {
+        'workers': len(results),
+        'after_fork': statistics.fmean(r['after_fork'] for r in results),
+        'after_requests': statistics.fmean(r['after_requests'] for r in results),
+    }
+
+
+def compare(paths, role, workers, requests, urlconf=DEFAULT_URLCONF):
+    """
+    Fork workers once without and once with freezing, each from a fresh process
+    """
+    results = {}
+    for scenario in ('unfrozen', 'frozen'):
+        cmd = [
+            sys.executable, '-m', 'benchmarks.memory', '--json',
+            '--scenario', scenario,
+            '--workers', str(workers),
+            '--requests', str(requests),
+            '--role', role,
+            '--urlconf', urlconf,
+        ]
+        for path in paths:
+            cmd += ['--path', path]
+        output = subprocess.run(cmd, cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+        results[scenario] = json.loads(output)
+    return results
+
+
+def report(results, out=sys.stdout):
+    print(f"{'':<10}{'workers':>10}{'USS after fork KiB':>20}{'USS after requests KiB':>24}", file=out)
+    for name, result in results.items():
+        print(f"{name:<10}{result['workers']:>10}{result['after_fork']:>20.0f}{result['after_requests']:>24.0f}", file=out)
+    if 'unfrozen' not in results or 'frozen' not in results:
+        return
+    saved = results['unfrozen']['after_requests'] - results['frozen']['after_requests']
+    print(f"\nsaved per worker: {saved:.0f} KiB", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=500, help="requests per worker")
+    parser.add_argument('--path', action='append', dest='paths', help=f"path to request, may be repeated (default: {DEFAULT_PATHS})")
+    parser.add_argument('--role', choices=('admin', 'user', 'anon'), default='admin')
+    parser.add_argument('--urlconf', default=DEFAULT_URLCONF)
+    parser.add_argument('--scenario', choices=('unfrozen', 'frozen'), help="do a single run in this process")
+    parser.add_argument('--json', action='store_true', help="print the result of a single run as JSON")
+    args = parser.parse_args(argv)
+    paths = args.paths or DEFAULT_PATHS
+
+    if not args.scenario:
+        report(compare(paths, args.role, args.workers, args.requests, args.urlconf))
+        return
+
+    configure(args.urlconf)
+    user = make_user(args.role)
+    if args.scenario == 'frozen':
+        from rest_framework_roles.patching import freeze
+        freeze(gc_freeze=True)
+    result = summarize(fork_workers(paths, user, args.workers, args.requests))
+    if args.json:
+        print(json.dumps(result))
+    else:
+        report({args.scenario: result})
+
+
+if __name__ == '__main__':
+    main()
@@ -6,5 +6,8 @@ class RestFrameworkRolesConfig(AppConfig):
     verbose_name = 'REST Framework Roles'
 
     def ready(self):
-        from .patching import patch
+        from django.conf import settings
+        from .patching import patch, install_resolver_hook
         patch()
+        if settings.REST_FRAMEWORK_ROLES.get("PATCH_ON_RESOLVE", False):
+            install_resolver_hook()
@@ -0,0 +1,105 @@
+"""
+Answer "what can this user do" without issuing real requests
+"""
+
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.parsing import get_role_registry
+from rest_framework_roles.permissions import decide_role_permissions, get_context, get_plan, get_tenant, matches_role
+
+
+def make_request(user_or_request, tenant=None):
+    """
+    Build a fresh request to evaluate role checkers against
+
+    A new request is used even when one is given, so the batch never shares
+    permission state with a request that is being served. Given a request, its
+    tenant and auth are kept. Given a user, the tenant is the one passed and
+    there is no auth, so role checkers reading token claims don't match.
+    """
+    if isinstance(user_or_request, Request):
+        request = Request(user_or_request._request)
+        request.user = user_or_request.user
+        request.auth = user_or_request.auth
+        tenant = get_tenant(user_or_request)
+    elif isinstance(user_or_request, HttpRequest):
+        request = Request(user_or_request)
+        request.user = user_or_request.user
+        request.auth = getattr(user_or_request, 'auth', None)  # Set by DRF once authenticated, e.g. claims of a token
+        tenant = get_tenant(user_or_request)
+    else:
+        http_request = HttpRequest()
+        http_request.method = 'GET'
+        request = Request(http_request)
+        request.user = user_or_request
+        request.auth = None
+    get_context(request).tenant = tenant
+    return request
+
+
+def make_view(view_class, request, action):
+    return view_class(request=request, args=(), kwargs={}, action=action, format_kwarg=None)
+
+
+def get_roles(request, view, roles=None):
+    """
+    Names of all roles the request matches, as a frozenset
+
+    Args:
+        request: A request built with make_request
+        roles: A RoleRegistry. Defaults to the registry of settings.
+    """
+    if roles is None:
+        roles = get_role_registry()
+    matched_roles = get_context(request).roles
+    names = []
+    for role in roles:
+        try:
+            matched = matched_roles[role.checker]
+        except KeyError:
+            matched = matched_roles[role.checker] = matches_role(request, view, role.checker)
+        if matched:
+            names.append(role.name)
+    return frozenset(names)
+
+
+def authorize(user_or_request, actions, tenant=None):
+    """
+    Decide in bulk which actions a user may perform
+
+    Every role checker is evaluated at most once for the whole batch, against the
+    view of the first action that needs it. Hence role checkers used here should
+    not depend on the view.
+
+    Args:
+        user_or_request: A user, or a request to take the user and tenant from
+        tenant: Tenant of the user, when a user is given
+        actions: Iterable of (view_class, action) pairs. The view classes must
+                 have been patched and action is a key in their view_permissions
+
+    Return:
+        Dict mapping each (view_class, action) to True or False. None is given
+        when access depends on a grant checker (e.g. is_self) and so can only be
+        known for an actual request.
+    """
+    return authorize_request(make_request(user_or_request, tenant), actions)
+
+
+def authorize_request(request, actions):
+    """
+    Same as authorize but for a request built with make_request
+    """
+    plan = get_plan(request)
+    decisions = {}
+    for view_class, action in actions:
+        view_permissions = plan.view_permissions(view_class)
+        if view_permissions is None:
+            raise Misconfigured(f"{view_class.__name__} has not been patched")
+        if action not in view_permissions:
+            decisions[(view_class, action)] = False  # Least privilege
+            continue
+        view = make_view(view_class, request, action)
+        decisions[(view_class, action)] = decide_role_permissions(request, view, view_permissions[action])
+    return decisions
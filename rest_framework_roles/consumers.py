@@ -0,0 +1,225 @@
+"""
+Permissions for messages received by Django Channels consumers
+
+    class ChatConsumer(ConsumerPermissionsMixin, JsonWebsocketConsumer):
+        consumer_permissions = {
+            'subscribe,unsubscribe': {'user': True},
+            'publish': {'admin': True, 'user': is_room_member},
+        }
+
+        def receive_json(self, content):
+            ..
+
+Rules are written like view_permissions, with message types in place of handler
+names. The type of a message is taken from its 'type' key. Every message passes
+the rules of its type before receive_json sees it; any other gets a denial sent
+back instead.
+
+Role and grant checkers are called with a ConsumerRequest in place of the request
+and the consumer in place of the view. Role checkers run once per connection and
+their results are kept until invalidate_permissions() is called, or a
+'rfr.invalidate' event is sent to the consumer through the channel layer.
+"""
+
+from functools import wraps
+from weakref import WeakKeyDictionary
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import PermissionDenied as DjangoPermissionDenied
+from django.http import Http404
+from rest_framework import exceptions
+from rest_framework.exceptions import APIException
+
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.granting import is_object_level
+from rest_framework_roles.parsing import parse_view_permissions, get_role_registry
+from rest_framework_roles import permissions
+
+
+DENIALS = (APIException, DjangoPermissionDenied, Http404)
+
+# Consumer class -> (RoleRegistry, compiled consumer_permissions)
+_compiled = WeakKeyDictionary()
+
+
+class ConsumerRequest():
+    """
+    Stands in for the request in role and grant checkers of consumers
+
+    Has the user, session, cookies and headers (as META) of the connection's scope.
+    `data` is the content of the message being checked.
+    """
+
+    def __init__(self, scope, META=None, data=None):
+        self.scope = scope
+        self.user = scope.get('user') or AnonymousUser()
+        self.auth = scope.get('auth')
+        self.session = scope.get('session')
+        self.COOKIES = scope.get('cookies', {})
+        self.path = scope.get('path', '')
+        self.method = scope.get('type', '')
+        self.data = data
+        if META is None:
+            META = {
+                'HTTP_' + name.decode('latin1').upper().replace('-', '_'): value.decode('latin1')
+                for name, value in scope.get('headers', ())
+            }
+        self.META = META
+
+
+def get_consumer_permissions(cls, roles):
+    """
+    Compiled consumer_permissions of given class, compiled once per RoleRegistry
+    """
+    try:
+        compiled_roles, lookup = _compiled[cls]
+    except KeyError:
+        compiled_roles = None
+    if compiled_roles is not roles:
+        lookup = parse_view_permissions(cls.consumer_permissions, roles)
+        for rules in lookup.values():
+            for granted, _ in rules:
+                if is_object_level(granted) or getattr(granted, 'grant_filter', False):
+                    raise Misconfigured(f"{cls.__qualname__}: consumers have no object or queryset to grant on")
+        _compiled[cls] = (roles, lookup)
+    return lookup
+
+
+class BaseConsumerPermissions():
+
+    consumer_permissions = {}
+    message_type_key = 'type'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Also wraps a handler inherited from a base consumer listed after the mixin
+        handler = getattr(cls, 'receive_json', None)
+        if handler is not None and not hasattr(handler, '_rfr_original'):
+            cls.receive_json = cls._rfr_wrap_receive_json(handler)
+
+    def get_connection_request(self):
+        """
+        Request of the connection, holding the role checker results kept for its lifetime
+        """
+        try:
+            return self._rfr_request
+        except AttributeError:
+            request = self._rfr_request = ConsumerRequest(self.scope)
+            permissions.get_plan(request)
+            permissions.get_tenant(request)
+            return request
+
+    def invalidate_permissions(self):
+        """
+        Run role checkers again for the next message, e.g. after roles of the user changed
+        """
+        self.__dict__.pop('_rfr_request', None)
+
+    def get_message_type(self, content):
+        return content.get(self.message_type_key) if isinstance(content, dict) else None
+
+    def check_message_permissions(self, content):
+        """
+        Check if the message may be received
+
+        Return:
+            None if granted, else the exception to deny with
+        """
+        connection = self.get_connection_request()
+        plan = permissions.get_plan(connection)
+        lookup = get_consumer_permissions(type(self), plan.roles or get_role_registry())
+        rules = lookup.get(self.get_message_type(content))
+
+        exception_class = plan.exception_class or exceptions.PermissionDenied  # Before patch() ran
+
+        request = ConsumerRequest(self.scope, connection.META, content)
+        request.__dict__[permissions.CONTEXT_ATTR] = permissions.get_context(connection).for_subrequest()
+        try:
+            granted = permissions.check_role_permissions(request, type(self), self, rules) if rules else None
+        except DENIALS + (exception_class,) as exc:
+            return exc
+        if granted:
+            return None
+        return exception_class()
+
+    def denied_message(self, content, exc):
+        """
+        Message sent back for a denied message. None to send nothing.
+        """
+        return {
+            'type': 'permission_denied',
+            'message_type': self.get_message_type(content),
+            'status': getattr(exc, 'status_code', 403),
+            'detail': str(getattr(exc, 'detail', exc)),
+        }
+
+
+class ConsumerPermissionsMixin(BaseConsumerPermissions):
+    """
+    Check consumer_permissions for every message of a JsonWebsocketConsumer
+    """
+
+    @staticmethod
+    def _rfr_wrap_receive_json(handler):
+        @wraps(handler)
+        def _rfr_wrapped_receive_json(self, content, **kwargs):
+            if getattr(self, '_rfr_message', None) is content:  # Checked by a subclass already
+                return handler(self, content, **kwargs)
+            denied = self.check_message_permissions(content)
+            if denied is not None:
+                message = self.denied_message(content, denied)
+                if message is not None:
+                    self.send_json(message)
+                return
+            self._rfr_message = content
+            try:
+                return handler(self, content, **kwargs)
+            finally:
+                self._rfr_message = None
+        _rfr_wrapped_receive_json._rfr_original = handler
+        return _rfr_wrapped_receive_json
+
+    def rfr_invalidate(self, event):
+        self.invalidate_permissions()
+
+
+class AsyncConsumerPermissionsMixin(BaseConsumerPermissions):
+    """
+    Check consumer_permissions for every message of an AsyncJsonWebsocketConsumer
+
+    Checks run in a thread, since role and grant checkers may query the database.
+    """
+
+    @staticmethod
+    def _rfr_wrap_receive_json(handler):
+        @wraps(handler)
+        async def _rfr_wrapped_receive_json(self, content, **kwargs):
+            if getattr(self, '_rfr_message', None) is content:  # Checked by a subclass already
+                return await handler(self, content, **kwargs)
+            denied = await database_sync_to_async(self.check_message_permissions)(content)
+            if denied is not None:
+                message = self.denied_message(content, denied)
+                if message is not None:
+                    await self.send_json(message)
+                return
+            self._rfr_message = content
+            try:
+                return await handler(self, content, **kwargs)
+            finally:
+                self._rfr_message = None
+        _rfr_wrapped_receive_json._rfr_original = handler
+        return _rfr_wrapped_receive_json
+
+    async def rfr_invalidate(self, event):
+        self.invalidate_permissions()
+
+
+def database_sync_to_async(fn):
+    """
+    Channels' database_sync_to_async, which also closes stale database connections
+    """
+    try:
+        from channels.db import database_sync_to_async
+    except ImportError:  # Only for running without Channels, e.g. in tests
+        from asgiref.sync import sync_to_async as database_sync_to_async
+    return database_sync_to_async(fn)
@@ -0,0 +1,3 @@
+"""
+Optional database backed roles. Add 'rest_framework_roles.db' to INSTALLED_APPS to use.
+"""
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class RoleAssignmentsConfig(AppConfig):
+    name = 'rest_framework_roles.db'
+    label = 'rest_framework_roles_db'
+    verbose_name = 'REST Framework Roles assignments'
+    default_auto_field = 'django.db.models.BigAutoField'
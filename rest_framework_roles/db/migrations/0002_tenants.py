@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_framework_roles_db', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='roleassignment',
+            name='unique_role_assignment',
+        ),
+        migrations.AddField(
+            model_name='roleassignment',
+            name='tenant',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='rolechange',
+            name='tenant',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddConstraint(
+            model_name='roleassignment',
+            constraint=models.UniqueConstraint(fields=('tenant', 'user', 'role'), name='unique_tenant_role_assignment'),
+        ),
+    ]
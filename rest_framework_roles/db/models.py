@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import models
+
+
+class RoleAssignment(models.Model):
+    """
+    A role stored for a user, within a tenant ('' when not tenant-scoped)
+    """
+    tenant = models.CharField(max_length=150, blank=True, default='')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='role_assignments')
+    role = models.CharField(max_length=150)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'user', 'role'], name='unique_tenant_role_assignment'),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant}:{self.user_id}:{self.role}"
+
+
+class RoleChange(models.Model):
+    """
+    Append-only log of changes to RoleAssignment. Ids are increasing versions.
+    """
+    tenant = models.CharField(max_length=150, blank=True, default='')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    role = models.CharField(max_length=150)
+    assigned = models.BooleanField()
+
+    def __str__(self):
+        return f"{self.id}:{self.tenant}:{self.user_id}:{'+' if self.assigned else '-'}{self.role}"
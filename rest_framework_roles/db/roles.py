@@ -0,0 +1,175 @@
+"""
+Roles stored in the database, checked against an in-memory snapshot
+
+    ROLES = {
+        'anon': is_anon,
+        'user': is_user,
+        **stored_roles('partner', 'editor'),
+    }
+
+Role checkers never query assignments directly. The snapshot is loaded once and
+then kept up to date by reading only the RoleChange rows added since.
+
+With TENANT_RESOLVER set, roles are looked up within the request's tenant.
+"""
+
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import Q
+
+from rest_framework_roles import decorators
+from rest_framework_roles import role_sets
+from rest_framework_roles.permissions import get_tenant
+
+
+DEFAULT_REFRESH_INTERVAL = 1.0  # seconds
+
+# Changes can commit out of id order between concurrent transactions. Ids skipped
+# by a refresh are gaps, looked for again on every refresh until they show up.
+# A gap missing for longer than GAP_TIMEOUT was rolled back, or belongs to a
+# transaction too long to wait for, so everything is loaded from scratch then.
+GAP_TIMEOUT = 60.0  # seconds
+MAX_GAPS = 1000
+
+
+class RoleSnapshot():
+    """
+    In-process copy of all RoleAssignment rows
+
+    Args:
+        refresh_interval(float): Seconds to wait before looking for changes again
+    """
+
+    def __init__(self, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.version = None     # Latest RoleChange applied. None until loaded
+        self.gaps = {}          # Ids below version not seen yet -> time first missed
+        self.assignments = {}   # (tenant, user id) -> frozenset of role names
+        self.refreshed_at = None
+        self._lock = threading.Lock()
+
+    def roles(self, user_id, tenant=''):
+        """
+        Role names stored for given user within tenant
+        """
+        if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.refresh_interval:
+            # Only one thread refreshes; the rest go on with what's loaded
+            if self._lock.acquire(blocking=self.version is None):
+                try:
+                    self.refresh()
+                finally:
+                    self._lock.release()
+        return self.assignments.get((tenant, user_id), frozenset())
+
+    def refresh(self):
+        from .models import RoleChange
+
+        if self.version is None:
+            self.load()
+            return
+
+        now = time.monotonic()
+        if self.gaps and (now - min(self.gaps.values()) >= GAP_TIMEOUT or len(self.gaps) > MAX_GAPS):
+            self.load()
+            return
+
+        query = Q(id__gt=self.version)
+        if self.gaps:
+            query |= Q(id__in=list(self.gaps))
+        changes = RoleChange.objects.filter(query).order_by('id')
+        for change in changes.values_list('id', 'tenant', 'user_id', 'role', 'assigned'):
+            version = change[0]
+            if version > self.version:
+                for missing in range(self.version + 1, version):
+                    self.gaps[missing] = now
+            else:
+                del self.gaps[version]  # Committed late. Changes of one assignment commit in id order.
+            self.apply(*change)
+        self.refreshed_at = now
+
+    def load(self):
+        from .models import RoleAssignment, RoleChange
+
+        # Version is read first, so changes committed meanwhile are applied on next refresh
+        latest = RoleChange.objects.order_by('-id').values_list('id', flat=True).first()
+        assignments = {}
+        for tenant, user_id, role in RoleAssignment.objects.values_list('tenant', 'user_id', 'role'):
+            assignments.setdefault((tenant, user_id), set()).add(role)
+        self.assignments = {key: frozenset(roles) for key, roles in assignments.items()}
+        self.version = latest or 0
+        self.gaps = {}
+        self.refreshed_at = time.monotonic()
+
+    def apply(self, version, tenant, user_id, role, assigned):
+        key = (tenant, user_id)
+        roles = self.assignments.get(key, frozenset())
+        if assigned:
+            self.assignments[key] = roles | {role}
+        else:
+            self.assignments[key] = roles - {role}
+        self.version = max(self.version, version)
+
+    def clear(self):
+        """
+        Forget everything so the next lookup loads from scratch
+        """
+        with self._lock:
+            self.version = None
+            self.gaps = {}
+            self.assignments = {}
+            self.refreshed_at = None
+
+
+snapshot = RoleSnapshot()
+
+
+def tenant_key(tenant):
+    """
+    Tenant as stored in the database
+    """
+    return '' if tenant is None else str(tenant)
+
+
+def stored_role(role_name, snapshot=snapshot):
+    """
+    Role checker for a role stored with assign_role
+    """
+    def is_stored_role(request, view):
+        user_id = request.user.pk
+        return user_id is not None and role_name in snapshot.roles(user_id, tenant_key(get_tenant(request)))
+    is_stored_role.__qualname__ = f"stored_role({role_name!r})"
+    is_stored_role.cost = decorators.DEFAULT_COST  # In-memory lookup
+    return is_stored_role
+
+
+def stored_roles(*role_names, snapshot=snapshot):
+    """
+    Role checkers for given stored roles, to be merged in ROLES
+    """
+    return {role_name: stored_role(role_name, snapshot) for role_name in role_names}
+
+
+def assign_role(user, role_name, tenant=None):
+    from .models import RoleAssignment, RoleChange
+
+    tenant = tenant_key(tenant)
+    with transaction.atomic():
+        _, created = RoleAssignment.objects.get_or_create(tenant=tenant, user=user, role=role_name)
+        if created:
+            RoleChange.objects.create(tenant=tenant, user=user, role=role_name, assigned=True)
+    if created and role_sets.config is not None:
+        role_sets.invalidate(user)
+
+
+def revoke_role(user, role_name, tenant=None):
+    from .models import RoleAssignment, RoleChange
+
+    tenant = tenant_key(tenant)
+    with transaction.atomic():
+        deleted, _ = RoleAssignment.objects.filter(tenant=tenant, user=user, role=role_name).delete()
+        if deleted:
+            RoleChange.objects.create(tenant=tenant, user=user, role=role_name, assigned=False)
+    if deleted and role_sets.config is not None:
+        role_sets.invalidate(user)
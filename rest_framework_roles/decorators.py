@@ -1,3 +1,6 @@
+from functools import wraps
+
+
 DEFAULT_COST = 0
 DEFAULT_EXPENSIVE = 50
 
@@ -19,3 +22,39 @@ def role_checker(*args, **kwargs):
         return decorator_role(*args)
     else:
         return decorator_role
+
+
+def grant_checker(*args, **kwargs):
+    """
+    Denote if grant checker needs the object of the view
+
+    Object level grant checkers are called as fn(request, view, obj). The object
+    is the one DRF loads in get_object(), so it is never fetched twice.
+    """
+    object_level = kwargs.get('object_level', False)
+
+    def decorator_grant(fn):
+        @wraps(fn)
+        def wrapped_grant(*args, **kwargs):
+            return fn(*args, **kwargs)
+        wrapped_grant.object_level = object_level
+        return wrapped_grant
+
+    if args and callable(args[0]):
+        return decorator_grant(*args)
+    else:
+        return decorator_grant
+
+
+def grant_filter(fn):
+    """
+    Denote a grant given as a Q object over the rows of the view's queryset
+
+    Called as fn(request, view). Instead of being evaluated in Python, the Q object
+    is added to the view's get_queryset(), so rows not granted are never loaded.
+    """
+    @wraps(fn)
+    def wrapped_grant(*args, **kwargs):
+        return fn(*args, **kwargs)
+    wrapped_grant.grant_filter = True
+    return wrapped_grant
@@ -0,0 +1,108 @@
+"""
+Prebuilt denial responses, enabled with the FAST_DENIAL setting
+
+Denials normally go through DRF's exception handler, a Response and its
+rendering. Since a denial is always the same for given exception class and
+content type, it is rendered once when patching and served as bytes after.
+Only views using the default renderers and exception handler get them.
+"""
+
+import logging
+
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+# Their response depends on the authenticators of the view
+NOT_PREBUILDABLE = (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+
+
+class PrebuiltDenial():
+    """
+    Status, headers and rendered bodies (by media type) of a denial, and the
+    detail it was rendered with
+    """
+
+    __slots__ = ('status', 'headers', 'bodies', 'detail')
+
+    def __init__(self, status, headers, bodies, detail):
+        self.status = status
+        self.headers = headers
+        self.bodies = bodies
+        self.detail = detail
+
+
+def prebuild(exception_class):
+    """
+    Render the response DRF would give for exception_class() with every default renderer
+
+    Return:
+        PrebuiltDenial or None if the response can't be known up front
+    """
+    if not issubclass(exception_class, exceptions.APIException) or issubclass(exception_class, NOT_PREBUILDABLE):
+        return None
+    try:
+        exc = exception_class()
+        response = api_settings.EXCEPTION_HANDLER(exc, {'view': None, 'args': (), 'kwargs': {}, 'request': None})
+    except Exception:
+        logger.debug("Can't prebuild denial for %s", exception_class, exc_info=True)
+        return None
+    if response is None:
+        return None
+
+    bodies = {}
+    for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES:
+        renderer = renderer_class()
+        try:
+            body = renderer.render(response.data, renderer.media_type, {})
+        except Exception:
+            continue  # e.g. BrowsableAPIRenderer needs a view
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        if isinstance(body, str):
+            body = body.encode(renderer.charset or 'utf-8')
+        bodies[renderer.media_type] = (content_type, body)
+    headers = {header: value for header, value in response.items() if header.lower() != 'content-type'}
+    return PrebuiltDenial(response.status_code, headers, bodies, exc.detail)
+
+
+def prebuild_all(exception_classes):
+    denials = {}
+    for exception_class in exception_classes:
+        denial = prebuild(exception_class)
+        if denial is not None:
+            denials[exception_class] = denial
+    return denials
+
+
+def get_response(view, exc, denials):
+    """
+    Get the prebuilt response for exc, if any, as negotiated for the view's request
+    """
+    denial = denials.get(type(exc))
+    if denial is None:
+        return None
+    # Only exceptions with the default detail, since others render their own.
+    # ErrorDetail compares its code too.
+    if exc.detail != denial.detail:
+        return None
+    # Only views responding like the denial was rendered
+    if view.get_exception_handler() is not api_settings.EXCEPTION_HANDLER:
+        return None
+    if list(view.renderer_classes) != list(api_settings.DEFAULT_RENDERER_CLASSES):
+        return None
+    _, media_type = view.perform_content_negotiation(view.request, force=True)
+    try:
+        content_type, body = denial.bodies[media_type]
+    except KeyError:
+        return None
+    response = HttpResponse(body, status=denial.status, content_type=content_type)
+    for header, value in denial.headers.items():
+        response[header] = value
+    response.exception = True
+    from rest_framework.views import set_rollback  # Not at import, it reads api_settings
+    set_rollback()  # Like the exception handler, for ATOMIC_REQUESTS
+    return response
@@ -0,0 +1,154 @@
+"""
+Explain how permissions were decided for a sample of requests, enabled with the EXPLAIN setting
+
+    REST_FRAMEWORK_ROLES = {
+        'ROLES': 'myproject.roles.ROLES',
+        'EXPLAIN': {
+            'SAMPLE_RATE': 0.01,                         # Share of requests to explain
+            'REQUEST_HEADER': 'X-Explain-Permissions',   # Also explain requests of staff sending this header
+        },
+    }
+
+An explained request gets its trace logged. The trace lists every role checked in
+order, whether it matched and came from the memo, the grant of the matched role
+and the time of each step. For staff users, or with DEBUG on, the trace is also
+returned in the X-Permissions-Explain response header.
+"""
+
+import json
+import logging
+import random
+import time
+
+from rest_framework_roles.exceptions import Misconfigured
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUEST_HEADER = 'X-Explain-Permissions'
+RESPONSE_HEADER = 'X-Permissions-Explain'
+
+config = None  # Explaining is off while None
+
+
+class ExplainConfig():
+
+    __slots__ = ('sample_rate', 'meta_key')
+
+    def __init__(self, sample_rate=0.0, request_header=DEFAULT_REQUEST_HEADER):
+        if not 0 <= sample_rate <= 1:
+            raise Misconfigured(f"EXPLAIN.SAMPLE_RATE must be between 0 and 1, got '{sample_rate}'")
+        self.sample_rate = sample_rate
+        self.meta_key = 'HTTP_' + request_header.upper().replace('-', '_') if request_header else None
+
+
+def load(rfr_settings):
+    """
+    Set up explaining from the EXPLAIN setting
+    """
+    global config
+    explain = rfr_settings.get('EXPLAIN')
+    if not explain:
+        config = None
+        return
+    unknown = set(explain) - {'SAMPLE_RATE', 'REQUEST_HEADER'}
+    if unknown:
+        raise Misconfigured(f"Unknown EXPLAIN settings {sorted(unknown)}")
+    config = ExplainConfig(explain.get('SAMPLE_RATE', 0.0), explain.get('REQUEST_HEADER', DEFAULT_REQUEST_HEADER))
+
+
+def wants_trace(request):
+    """
+    Decide if request is explained: if flagged by its header or else sampled
+
+    The header is only honoured for users who may see the trace, so others can't
+    have every request of theirs logged and timed.
+    """
+    if config.meta_key and config.meta_key in request.META and may_see_trace(request):
+        return True
+    return config.sample_rate > 0 and random.random() < config.sample_rate
+
+
+def _name(role_checker, roles):
+    role = roles.by_checker(role_checker) if roles else None
+    if role is not None:
+        return role.name
+    return getattr(role_checker, '__qualname__', repr(role_checker))
+
+
+def _grant_type(granted):
+    if type(granted) is bool:
+        return 'bool'
+    if isinstance(granted, type):
+        return 'exception'
+    scheme = getattr(granted, 'scheme', None)
+    if scheme is not None:
+        return 'not_' if scheme == 'not' else f"{scheme}of"
+    return 'function'
+
+
+class Trace():
+    """
+    Steps of the permission checks of one request
+    """
+
+    __slots__ = ('roles', 'steps', 'role')
+
+    def __init__(self, roles):
+        self.roles = roles
+        self.steps = []
+        self.role = None
+
+    def match_role(self, request, view_instance, role_checker, matched_roles, matches_role):
+        """
+        Same as looking role_checker up in matched_roles, but records the step
+        """
+        start = time.perf_counter()
+        cached = role_checker in matched_roles
+        if cached:
+            matched = matched_roles[role_checker]
+        else:
+            matched = matched_roles[role_checker] = matches_role(request, view_instance, role_checker)
+        self.steps.append({
+            'role': _name(role_checker, self.roles),
+            'matched': bool(matched),
+            'cached': cached,
+            'ms': (time.perf_counter() - start) * 1000,
+        })
+        if matched and self.role is None:
+            self.role = self.steps[-1]['role']
+        return matched
+
+    def grant(self, role_checker, granted, outcome, start):
+        self.steps.append({
+            'role': _name(role_checker, self.roles),
+            'grant': _grant_type(granted),
+            'granted': outcome if type(outcome) is bool else repr(outcome),
+            'ms': (time.perf_counter() - start) * 1000,
+        })
+
+    def check(self, view, outcome):
+        self.steps.append({'check': getattr(view, '__qualname__', repr(view)), 'outcome': repr(outcome)})
+
+    def as_dict(self):
+        return {'role': self.role, 'steps': self.steps}
+
+    def __str__(self):
+        return json.dumps(self.as_dict(), separators=(',', ':'), default=repr)
+
+
+def finish(request, response, trace):
+    """
+    Log the trace and return it in the response if the user may see it
+    """
+    logger.info("Permissions of %s %s: %s", request.method, request.path, trace)
+    if may_see_trace(request):
+        response[RESPONSE_HEADER] = str(trace)
+    return response
+
+
+def may_see_trace(request):
+    """
+    Staff users may, and everyone with DEBUG on
+    """
+    from django.conf import settings
+    return settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False)
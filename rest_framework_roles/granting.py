@@ -1,4 +1,8 @@
+from django.core.exceptions import ValidationError
+
 from rest_framework_roles import exceptions
+from rest_framework_roles import tracing
+from rest_framework_roles.decorators import grant_checker
 
 
 TYPE_FUNCTION = type(lambda x: x)
@@ -8,18 +12,99 @@ def is_self(request, view):
     return request.user == view.get_object()
 
 
+def is_self_lookup(request, view):
+    """
+    Same as is_self but compares the URL's lookup with the user's key, so the object isn't loaded
+
+    Only views over the user model looked up by primary key take the shortcut,
+    any other view falls back to is_self.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    lookup_field = getattr(view, 'lookup_field', 'pk')
+    value = view.kwargs.get(getattr(view, 'lookup_url_kwarg', None) or lookup_field)
+    queryset = getattr(view, 'queryset', None)
+    pk = user._meta.pk
+    if value is None or lookup_field not in ('pk', pk.name) or queryset is None or not isinstance(user, queryset.model):
+        return is_self(request, view)
+    try:
+        return pk.to_python(value) == user.pk
+    except ValidationError:
+        return False
+
+
+@grant_checker(object_level=True)
+def is_self_object(request, view, obj):
+    """
+    Same as is_self but reuses the object that the view loads anyway
+    """
+    return request.user == obj
+
+
+def is_object_level(granted):
+    """ Checks if granting needs the object of the view """
+    return getattr(granted, 'object_level', False)
+
+
 def allof(*grant_checkers):
-    return GrantChecker('all', grant_checkers)
+    return GrantChecker.intern('all', grant_checkers)
 
 
 def anyof(*grant_checkers):
-    return GrantChecker('any', grant_checkers)
+    return GrantChecker.intern('any', grant_checkers)
+
+
+def not_(grant_checker):
+    return GrantChecker.intern('not', (grant_checker,))
 
 
-def bool_granted(request, view, granted, view_instance):
+def fold_grant(granted):
+    """
+    Fold constants and nesting away from a grant, as done when parsing view_permissions
+
+    Return:
+        An interned GrantChecker, or a single checker or boolean if that's all it takes
+    """
+    if type(granted) is not GrantChecker:
+        return granted
+    for checker in granted.checkers:
+        if getattr(checker, 'grant_filter', False):
+            raise exceptions.Misconfigured(f"Grant filter {checker.__qualname__} can't be combined with allof, anyof or not_")
+    scheme = granted.scheme
+    checkers = [fold_grant(checker) for checker in granted.checkers]
+
+    if scheme == 'not':
+        checker, = checkers
+        if type(checker) is bool:
+            return not checker
+        if type(checker) is GrantChecker and checker.scheme == 'not':
+            return checker.checkers[0]
+        return GrantChecker.intern(scheme, checkers)
+
+    absorbing = scheme == 'any'  # True decides anyof, False decides allof
+    folded = []
+    for checker in checkers:
+        nested = checker.checkers if type(checker) is GrantChecker and checker.scheme == scheme else (checker,)
+        for checker in nested:
+            if type(checker) is bool:
+                if checker is absorbing:
+                    return absorbing
+            elif checker not in folded:
+                folded.append(checker)
+    if not folded:
+        return not absorbing
+    if len(folded) == 1:
+        return folded[0]
+    return GrantChecker.intern(scheme, folded)
+
+
+def bool_granted(request, view, granted, view_instance, obj=None):
     """ Checks if permission evaluates to true """
     if hasattr(granted, '__call__'):
-        if view_instance:
+        if is_object_level(granted):
+            return granted(request, view=view_instance, obj=obj)
+        elif view_instance:
             return granted(request, view=view_instance)
         else:
             return granted(request, view=view)
@@ -28,34 +113,117 @@ def bool_granted(request, view, granted, view_instance):
     return granted
 
 
+def evaluate_grant(granted, request, view, view_instance, obj=None, memo=None):
+    """
+    Evaluate a grant checker or combination of them
+
+    Args:
+        memo(dict): Results so far for the same view instance and handler. Each
+            distinct checker or combination in it is evaluated at most once.
+    """
+    if type(granted) is bool:
+        return granted
+    if memo is None:
+        memo = {}
+    key = (granted, ObjectKey(obj)) if is_object_level(granted) else granted
+    try:
+        return memo[key]
+    except KeyError:
+        pass
+    if type(granted) is GrantChecker:
+        result = granted.evaluate(request, view, view_instance, obj, memo)
+    else:
+        result = bool(bool_granted(request, view, granted, view_instance, obj))
+    memo[key] = result
+    return result
+
+
+class ObjectKey():
+    """
+    Memo key of an object by identity, holding it so its id is never reused meanwhile
+    """
+
+    __slots__ = ('obj',)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __hash__(self):
+        return id(self.obj)
+
+    def __eq__(self, other):
+        return type(other) is ObjectKey and other.obj is self.obj
+
+
+_INTERNED_GRANT_CHECKERS = {}
+
+
 class GrantChecker():
     """
     Checks if grant should be given based on passed scheme and checkers
+
+    Checkers can be grant checker functions, booleans or other GrantCheckers.
+    Identical combinations made with allof, anyof and not_ are the same object,
+    so the grants of a handler form a DAG where shared parts are evaluated once
+    per check of the handler (see evaluate_grant).
     """
 
     SCHEMES = {
         'all': all,
         'any': any,
+        'not': lambda grants: not next(iter(grants)),
     }
 
+    __slots__ = ('scheme', 'checkers', 'object_level', '_hash')
+
     def __init__(self, scheme, checkers):
         assert scheme in self.SCHEMES.keys(), f"Invalid scheme; '{scheme}'. Must be one of {self.SCHEMES.keys()}"
         for checker in checkers:
-            if type(checker) not in (TYPE_FUNCTION, bool):
+            if type(checker) not in (TYPE_FUNCTION, bool, GrantChecker):
                 raise Exception("Grant checker must be either a boolean or a function evaluationg to boolean")
+        if scheme == 'not' and len(checkers) != 1:
+            raise Exception("not_ takes exactly one grant checker")
         self.scheme = scheme
-        self.checkers = checkers
+        self.checkers = tuple(checkers)
+        self.object_level = any(is_object_level(checker) for checker in self.checkers)
+        self._hash = hash(self.scheme) ^ hash(self.checkers)
 
-    def evaluate(self, request, view, view_instance):
-        grants = [bool_granted(request, view, checker, view_instance) for checker in self.checkers]
+    @classmethod
+    def intern(cls, scheme, checkers):
+        """
+        Get the one GrantChecker of the process equal to GrantChecker(scheme, checkers)
+        """
+        grant_checker = cls(scheme, checkers)
+        return _INTERNED_GRANT_CHECKERS.setdefault(grant_checker, grant_checker)
+
+    def evaluate(self, request, view, view_instance, obj=None, memo=None):
+        if tracing.exporter is None:
+            return self._evaluate(request, view, view_instance, obj, memo)
+        with tracing.span('rfr.grant_checker', scheme=self.scheme, checkers=[getattr(c, '__qualname__', repr(c)) for c in self.checkers]) as span:
+            granted = self._evaluate(request, view, view_instance, obj, memo)
+            span.set_attribute('outcome', bool(granted))
+            return granted
+
+    def _evaluate(self, request, view, view_instance, obj=None, memo=None):
+        if memo is None:
+            memo = {}
         try:
-            return self.SCHEMES[self.scheme](grants)
+            scheme = self.SCHEMES[self.scheme]
         except KeyError:
             raise Exception(f"Invalid scheme '{self.scheme}'")
+        return scheme(evaluate_grant(checker, request, view, view_instance, obj, memo) for checker in self.checkers)
 
     def __hash__(self):
         """
         NOTE: Hashing does not take into account request. We simply want to check
               that two GrantCheckers will check the same things
         """
-        return hash(self.scheme) ^ hash(self.checkers)
\ No newline at end of file
+        return self._hash
+
+    def __eq__(self, other):
+        if type(other) is not GrantChecker:
+            return NotImplemented
+        return self is other or (self.scheme == other.scheme and self.checkers == other.checkers)
+
+    def __repr__(self):
+        return f"GrantChecker({self.scheme!r}, {self.checkers!r})"
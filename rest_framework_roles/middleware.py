@@ -0,0 +1,155 @@
+"""
+Optional middleware
+
+    MIDDLEWARE = [
+        ..
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'rest_framework_roles.middleware.EarlyDenyMiddleware',
+    ]
+"""
+
+import logging
+
+from django.contrib.auth.models import AnonymousUser
+from django.urls import resolve, Resolver404
+from rest_framework.views import APIView
+
+from rest_framework_roles import permissions
+from rest_framework_roles import plans
+from rest_framework_roles import role_sets
+
+logger = logging.getLogger(__name__)
+
+
+class EarlyDenyMiddleware():
+    """
+    Deny anonymous requests that no rule could ever grant, before the view runs
+
+    Anonymous requests to patched views are checked against the rules of the
+    handler they would reach. If the rules deny access regardless of the request,
+    the response is built right away, skipping DRF's authentication, throttling
+    and parsing. The response is the same the view would give.
+
+    A request counts as anonymous if Django's AuthenticationMiddleware found no
+    user and it carries none of credential_headers. Any other request, and any
+    request that can't be decided up front, goes through as usual.
+    """
+
+    credential_headers = ('HTTP_AUTHORIZATION',)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = None
+        if self.is_anonymous(request):
+            response = self.deny_early(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    def is_anonymous(self, request):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_anonymous:
+            return False
+        return not any(header in request.META for header in self.credential_headers)
+
+    def deny_early(self, request):
+        """
+        Return the denial response or None if access can't be denied up front
+        """
+        try:
+            match = resolve(request.path_info, urlconf=getattr(request, 'urlconf', None))
+        except Resolver404:
+            return None
+
+        callback = match.func
+        cls = getattr(callback, 'view_class', None) or getattr(callback, 'cls', None)
+        if cls is None or not issubclass(cls, APIView):
+            return None  # Only DRF views can be set up without running them
+        plan = plans.current_plan()
+        view_permissions = plan.view_permissions(cls)
+        if view_permissions is None:
+            return None
+
+        # Find the handler the same way DRF would
+        method = request.method.lower()
+        actions = getattr(callback, 'actions', None)
+        if actions is not None:
+            handler_name = actions.get(method)
+        elif method in cls.http_method_names and hasattr(cls, method):
+            handler_name = method
+        else:
+            handler_name = None
+        if handler_name is None:
+            return None  # Let the view answer 405
+
+        view = self.make_view(callback, cls, request, match)
+        rules = view_permissions.get(handler_name)
+        if rules is None:
+            exception_class = plan.exception_class  # Least privilege
+        else:
+            try:
+                decision = permissions._decide_role_permissions(view.request, view, rules)
+            except Exception:
+                logger.debug("EarlyDenyMiddleware: could not decide %s", request.path_info, exc_info=True)
+                return None
+            if decision is True or decision is None:
+                return None
+            exception_class = decision or plan.exception_class
+
+        logger.debug("EarlyDenyMiddleware: denied %s %s", request.method, request.path_info)
+        return self.make_response(view, exception_class)
+
+    def make_view(self, callback, cls, request, match):
+        """
+        Set up the view like DRF's dispatch does, but without authenticating
+        """
+        initkwargs = getattr(callback, 'initkwargs', None) or getattr(callback, 'view_initkwargs', {})
+        view = cls(**initkwargs)
+        actions = getattr(callback, 'actions', None)
+        if actions is not None:
+            view.action_map = actions
+        view.args = match.args
+        view.kwargs = match.kwargs
+        view.request = request
+        view.format_kwarg = None
+        drf_request = view.initialize_request(request, *match.args, **match.kwargs)
+        drf_request.user = AnonymousUser()
+        drf_request.auth = None
+        view.request = drf_request
+        view.headers = view.default_response_headers
+        return view
+
+    def make_response(self, view, exception_class):
+        response = view.handle_exception(exception_class())
+        response = view.finalize_response(view.request, response)
+        response.render()
+        return response
+
+
+class RoleSetCookieMiddleware():
+    """
+    Set the cookie of role sets computed during the request, for ROLE_SETS 'cookie'
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        value = request.__dict__.get(role_sets.PENDING_ATTR)
+        if value is None:
+            return response
+        from django.conf import settings
+        if value:
+            response.set_cookie(
+                role_sets.COOKIE_NAME, value,
+                max_age=settings.SESSION_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+        else:
+            response.delete_cookie(role_sets.COOKIE_NAME, samesite=settings.SESSION_COOKIE_SAMESITE)
+        return response
@@ -1,4 +1,6 @@
 import importlib
+import functools
+from types import MappingProxyType
 
 from django.conf import settings
 from django.utils.module_loading import import_string
@@ -6,11 +8,54 @@ import django.core.exceptions as django_exceptions
 
 from rest_framework_roles.exceptions import Misconfigured
 from rest_framework_roles import decorators
+from rest_framework_roles.granting import fold_grant
 
 
-VALID_SETTINGS = {"ROLES", "SKIP_MODULES", "DEFAULT_EXCEPTION_CLASS"}
+VALID_SETTINGS = {"ROLES", "SKIP_MODULES", "DEFAULT_EXCEPTION_CLASS", "FAST_DENIAL", "TENANT_RESOLVER", "TRACING", "EXPLAIN",
+                  "PATCH_ON_RESOLVE", "ROLE_SETS"}
 REQUIRED_SETTINGS = {"ROLES"}
 
+# Handlers whose DRF implementation loads through get_queryset(), so grant filters apply
+QUERYSET_HANDLERS = {'list', 'retrieve', 'update', 'partial_update', 'destroy'}
+
+# Identical rules and rule sets are shared by every view class in the process
+_INTERNED_RULES = {}
+
+
+class Rule(tuple):
+    """
+    A single (granted, role_checker) entry of a handler's permissions
+
+    Being a tuple, it compares and hashes like the plain tuples used before, but
+    carries no per-instance __dict__.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, granted, role_checker):
+        return tuple.__new__(cls, (granted, role_checker))
+
+    @property
+    def granted(self):
+        return self[0]
+
+    @property
+    def role_checker(self):
+        return self[1]
+
+    def __repr__(self):
+        return f"Rule({self[0]!r}, {self[1]!r})"
+
+
+def intern_rules(rules):
+    """
+    Return the process-wide instance equal to given rule or tuple of rules
+
+    Interned rule sets live for the lifetime of the process, so their identity
+    can be used as a precomputed hash (see permissions.check_role_permissions).
+    """
+    return _INTERNED_RULES.setdefault(rules, rules)
+
 
 def validate_config(config):
     for setting in config.keys():
@@ -40,6 +85,90 @@ def load_roles(config=None):
     return roles
 
 
+class Role():
+    """
+    A role as registered in ROLES
+    """
+
+    __slots__ = ('id', 'name', 'checker', 'cost')
+
+    def __init__(self, id, name, checker, cost):
+        self.id = id
+        self.name = name
+        self.checker = checker
+        self.cost = cost
+
+    def __repr__(self):
+        return f"Role({self.id}, {self.name!r}, cost={self.cost})"
+
+
+class RoleRegistry():
+    """
+    Immutable lookup of roles by name
+
+    Roles get ids in the order they are defined in ROLES. Unlike parse_roles,
+    building a registry never touches the role checkers themselves.
+    """
+
+    __slots__ = ('_roles', '_by_checker')
+
+    def __init__(self, roles_dict):
+        assert isinstance(roles_dict, dict), f"Expected roles to be dict. Got {roles_dict}"
+        roles = {}
+        by_checker = {}
+        for role_id, (role_name, role_checker) in enumerate(roles_dict.items()):
+            cost = getattr(role_checker, 'cost', decorators.DEFAULT_COST)
+            roles[role_name] = Role(role_id, role_name, role_checker, cost)
+            by_checker.setdefault(role_checker, roles[role_name])
+        object.__setattr__(self, '_roles', MappingProxyType(roles))
+        object.__setattr__(self, '_by_checker', MappingProxyType(by_checker))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __getitem__(self, role_name):
+        return self._roles[role_name]
+
+    def __contains__(self, role_name):
+        return role_name in self._roles
+
+    def __iter__(self):
+        return iter(self._roles.values())
+
+    def __len__(self):
+        return len(self._roles)
+
+    def by_checker(self, role_checker):
+        """
+        Role of given role checker. If shared by several roles, the first defined.
+        None for a role checker not in the registry, e.g. compiled with another roleconfig.
+        """
+        return self._by_checker.get(role_checker)
+
+
+@functools.lru_cache(maxsize=None)
+def get_role_registry():
+    """
+    Registry for the ROLES in settings. Loaded and validated once per process
+    """
+    return RoleRegistry(load_roles())
+
+
+@functools.lru_cache(maxsize=None)
+def get_tenant_resolver():
+    """
+    The TENANT_RESOLVER in settings, or None when serving a single tenant
+
+    A tenant resolver takes a request and returns a hashable key of its tenant.
+    """
+    resolver = load_settings().get("TENANT_RESOLVER")
+    if isinstance(resolver, str):
+        resolver = import_string(resolver)
+    if resolver is not None and not callable(resolver):
+        raise Misconfigured(f"TENANT_RESOLVER must be callable, got '{resolver}'")
+    return resolver
+
+
 def parse_roles(roles_dict):
     """
     Parses given roles to a common structure that can be used for building the lookup
@@ -73,23 +202,26 @@ def parse_roles(roles_dict):
 def get_permission_list(parsed_roles, raw_permissions):
     _permissions = []
     for role, granted in raw_permissions.items():
-        _permissions.append((
-            granted,
+        _permissions.append(intern_rules(Rule(
+            fold_grant(granted),
             parsed_roles[role]['role_checker'],
-        ))
+        )))
     return _permissions
 
 
 def parse_view_permissions(view_permissions, roles=None):
     """
     Transform view_permissions into a lookup table that can be used directly for checking permissions
+
+    Args:
+        roles: A RoleRegistry or a dict like ROLES. Defaults to the registry of settings.
     """
     lookup = {}
     if not roles:
-        roles = load_roles()
-    roles = parse_roles(roles)
+        roles = get_role_registry()
+    elif not isinstance(roles, RoleRegistry):
+        roles = RoleRegistry(roles)
     assert type(view_permissions) is dict, f"Expected view_permissions to be dict. Got {view_permissions}"
-    assert type(roles) is dict, f"Expected roles to be dict. Got {roles}"
 
     # Check roles in permissions are correct before continuing
     roles_in_view_permissions = set()
@@ -100,18 +232,17 @@ def parse_view_permissions(view_permissions, roles=None):
         if role not in roles:
             raise Misconfigured(f"Role '{role}' found in view_permissions but such role not defined in ROLES")
 
-    # Populate general and instance checkers
+    # Populate general and instance checkers, sorted by cost
     for view_names, permissions in view_permissions.items():
-        _permissions = get_permission_list(roles, permissions)
+        _permissions = sorted(permissions.items(), key=lambda item: roles[item[0]].cost)
+        _permissions = [intern_rules(Rule(fold_grant(granted), roles[role].checker)) for role, granted in _permissions]
         for view_name in view_names.split(","):
+            if view_name not in QUERYSET_HANDLERS and any(getattr(rule.granted, 'grant_filter', False) for rule in _permissions):
+                raise Misconfigured(f"Grant filters only apply to handlers loading through get_queryset(), not '{view_name}'")
             lookup[view_name] = _permissions
 
-    # Sort by cost
-    for view, rules in lookup.items():
-        rules.sort(key=lambda item: item[1].cost)
-
-    # Finally turn into tuples for easy hashing
+    # Finally turn into tuples for easy hashing, sharing identical rule sets
     for view, rules in lookup.items():
-        lookup[view] = tuple(rules)
+        lookup[view] = intern_rules(tuple(rules))
 
-    return lookup
\ No newline at end of file
+    return lookup
@@ -1,19 +1,28 @@
+import gc
 import sys
 import importlib
 import logging
 import fnmatch
+import threading
+import weakref
 from functools import wraps
 
 from django.urls import resolve, get_resolver
-from django.urls.resolvers import URLPattern
+from django.urls.resolvers import URLPattern, URLResolver
 from django.conf import settings
-from django.utils.functional import empty
+from django.utils.functional import cached_property, empty
 from django.core.exceptions import PermissionDenied
+from django.http import Http404
 from django.utils.module_loading import import_string
 from rest_framework.permissions import BasePermission
 
+from rest_framework_roles import denials
+from rest_framework_roles import explain
 from rest_framework_roles import permissions
-from rest_framework_roles.parsing import parse_view_permissions
+from rest_framework_roles import plans
+from rest_framework_roles import role_sets
+from rest_framework_roles import tracing
+from rest_framework_roles.parsing import parse_view_permissions, get_role_registry, get_tenant_resolver, RoleRegistry
 from rest_framework_roles.exceptions import Misconfigured
 
 logger = logging.getLogger(__name__)
@@ -35,12 +44,17 @@ DEFAULT_SKIP_MODULES = {
 }
 
 
-DEFAULT_EXCEPTION_CLASS = "rest_framework.exceptions.PermissionDenied"
+DEFAULT_EXCEPTION_CLASS_PATH = "rest_framework.exceptions.PermissionDenied"
+DEFAULT_EXCEPTION_CLASS = DEFAULT_EXCEPTION_CLASS_PATH
+
+# Patterns patched so far, so patch_patterns only does what's new
+_patched_patterns = weakref.WeakSet()
+_patch_lock = threading.RLock()
 
 
 class DefaultPermission(BasePermission):
     def has_permission(self, request, view):
-        raise DEFAULT_EXCEPTION_CLASS
+        raise permissions.get_plan(request).exception_class or DEFAULT_EXCEPTION_CLASS
 
 
 def is_django_configured():
@@ -73,7 +87,38 @@ def retrieve_handler(self, request):
     return handler
 
 
-def _rfr_wrap_handler(handler, handler_permissions):
+def is_stock_object_handler(cls, handler_name, handler):
+    """
+    Check if handler is DRF's own, which loads the object with get_object() before anything else
+    """
+    from rest_framework import generics, mixins
+
+    stock = {
+        'retrieve': mixins.RetrieveModelMixin.retrieve,
+        'update': mixins.UpdateModelMixin.update,
+        'partial_update': mixins.UpdateModelMixin.partial_update,
+        'destroy': mixins.DestroyModelMixin.destroy,
+    }
+    if handler_name not in permissions.OBJECT_PHASE_HANDLERS or get_original(handler) is not stock[handler_name]:
+        return False
+    if handler_name == 'partial_update' and get_original(getattr(cls, 'update', None)) is not stock['update']:
+        return False  # Stock partial_update goes through update
+    return get_original(getattr(cls, 'get_object', None)) is generics.GenericAPIView.get_object
+
+
+def loads_through_queryset(cls, handler_name):
+    """
+    Check if handler is DRF's own, which loads through get_queryset() before anything else
+    """
+    from rest_framework import mixins
+
+    handler = getattr(cls, handler_name)
+    if handler_name == 'list':
+        return get_original(handler) is mixins.ListModelMixin.list
+    return is_stock_object_handler(cls, handler_name, handler)
+
+
+def _rfr_wrap_handler(handler, cls, handler_name):
 
     @wraps(handler)  # Preserve original function's metadata
     def _rfr_wrapped_handler(self, request, *args, **kwargs):
@@ -82,12 +127,32 @@ def _rfr_wrap_handler(handler, handler_permissions):
         hence it shall ALWAYS check for permissions.
         """
 
-        granted = permissions.check_role_permissions(request, handler, self, handler_permissions)
-        if not granted:
-            raise DEFAULT_EXCEPTION_CLASS
+        # A subclass's handler calling super() into this one was checked already,
+        # with the permissions of the class actually serving the request
+        if self.__dict__.get('_rfr_handler') == handler_name:
+            return handler(self, request, *args, **kwargs)
+
+        # Permissions are looked up in the plan of the request, see plans
+        plan = permissions.get_plan(request)
+        handler_permissions = plan.handler_permissions(cls, handler_name)
+        if handler_permissions is None:
+            raise plan.exception_class
 
-        return handler(self, request, *args, **kwargs)
-    
+        granted = permissions.check_role_permissions(request, handler, self, handler_permissions, defer=defer)
+        if not granted:
+            raise plan.exception_class
+
+        outer = self.__dict__.get('_rfr_handler')
+        self._rfr_handler = handler_name
+        try:
+            return handler(self, request, *args, **kwargs)
+        finally:
+            self._rfr_handler = outer
+
+    # Only DRF's own handlers surely load the object before doing anything else
+    defer = is_stock_object_handler(cls, handler_name, handler)
+    _rfr_wrapped_handler._rfr_class = cls
+    _rfr_wrapped_handler._rfr_original = handler
     return _rfr_wrapped_handler
 
 
@@ -97,13 +162,15 @@ def _rfr_wrap_check_permissions(original_check_permissions):
         Bypass normal check_permissions behaviour when we use check_role_permissions
         """
         handler = retrieve_handler(self, request)
+        plan = permissions.get_plan(request)
+        view_permissions = plan.view_permissions(self.__class__) or {}
 
         def is_explicitly_protected(self, request):
             """
             Determine if request handler is mentioned in view_permissions
             """
 
-            if handler.__name__ in self._view_permissions:
+            if handler.__name__ in view_permissions:
                 return True
 
             if handler.__qualname__.endswith("._rfr_wrapped_handler"): # TRUE
@@ -113,7 +180,7 @@ def _rfr_wrap_check_permissions(original_check_permissions):
 
             if getattr(self, "action", None):
                 # e.g. ModelViewSet, ViewSet
-                if self.action in self._view_permissions:
+                if self.action in view_permissions:
                     return True
 
             # If we can't determine the final handler at this point.
@@ -129,12 +196,71 @@ def _rfr_wrap_check_permissions(original_check_permissions):
             # Allow 405 to be returned
             return
         elif not is_explicitly_protected(self, request):
-            logger.warning(f"{self.__class__.__name__}: Handler '{handler.__name__}' fired but no explicit permission found in 'view_permissions' for this handler. Denying access")
-            raise DEFAULT_EXCEPTION_CLASS
+            logger.warning("%s: Handler '%s' fired but no explicit permission found in 'view_permissions' for this handler. Denying access", self.__class__.__name__, handler.__name__)
+            raise plan.exception_class
 
     return _rfr_wrapped_check_permissions
 
 
+def _rfr_wrap_check_object_permissions(original_check_object_permissions):
+    @wraps(original_check_object_permissions)
+    def _rfr_wrapped_check_object_permissions(self, request, obj):
+        """
+        Run the object level grants deferred by _rfr_wrap_handler on the object DRF loaded
+        """
+        if not permissions.check_object_role_permissions(request, obj):
+            raise permissions.get_plan(request).exception_class
+
+    return _rfr_wrapped_check_object_permissions
+
+
+def _rfr_wrap_handle_exception(original_handle_exception):
+    @wraps(original_handle_exception)
+    def _rfr_wrapped_handle_exception(self, exc):
+        """
+        Deny objects filtered out by grant filters, and serve denials prebuilt by
+        denials.prebuild when FAST_DENIAL is on
+        """
+        # An object filtered out by a grant filter is denied, not missing
+        if isinstance(exc, Http404) and permissions.get_context(self.request).filters:
+            exc = permissions.get_plan(self.request).exception_class()
+
+        prebuilt = permissions.get_plan(self.request).denials
+        if prebuilt:
+            response = denials.get_response(self, exc, prebuilt)
+            if response is not None:
+                return response
+        return original_handle_exception(self, exc)
+
+    return _rfr_wrapped_handle_exception
+
+
+def _rfr_wrap_get_queryset(original_get_queryset):
+    @wraps(original_get_queryset)
+    def _rfr_wrapped_get_queryset(self, *args, **kwargs):
+        """
+        Apply the grant filters of the request
+        """
+        return permissions.filter_queryset(self.request, original_get_queryset(self, *args, **kwargs))
+
+    return _rfr_wrapped_get_queryset
+
+
+def _rfr_wrap_finalize_response(original_finalize_response):
+    @wraps(original_finalize_response)
+    def _rfr_wrapped_finalize_response(self, request, response, *args, **kwargs):
+        """
+        Attach the explanation of the permission checks when the request was explained
+        """
+        response = original_finalize_response(self, request, response, *args, **kwargs)
+        context = request.__dict__.get(permissions.CONTEXT_ATTR)
+        if context is not None and context.explain:
+            explain.finish(request, response, context.explain)
+        return response
+
+    return _rfr_wrapped_finalize_response
+
+
 # ------------------------------------------------------------------------------
 
 
@@ -167,11 +293,17 @@ def get_view_class(callback):
 
 
 def post_patch():
+    from django.conf import settings
+
+    # Start or stop tracing. Without the setting, an exporter set with tracing.set_exporter is kept
+    if "TRACING" in settings.REST_FRAMEWORK_ROLES:
+        tracing.set_exporter(tracing.load_exporter(settings.REST_FRAMEWORK_ROLES))
+    explain.load(settings.REST_FRAMEWORK_ROLES)
+    role_sets.load(settings.REST_FRAMEWORK_ROLES)
 
     # Parse DEFAULT_EXCEPTION_CLASS
     global DEFAULT_EXCEPTION_CLASS
-    from django.conf import settings
-    DEFAULT_EXCEPTION_CLASS = settings.REST_FRAMEWORK_ROLES.get("DEFAULT_EXCEPTION_CLASS", DEFAULT_EXCEPTION_CLASS)
+    DEFAULT_EXCEPTION_CLASS = settings.REST_FRAMEWORK_ROLES.get("DEFAULT_EXCEPTION_CLASS", DEFAULT_EXCEPTION_CLASS_PATH)
     if not isinstance(DEFAULT_EXCEPTION_CLASS, str):
         raise Misconfigured("DEFAULT_EXCEPTION_CLASS must be a string")
     try:
@@ -206,71 +338,283 @@ def patch(urlconf=None, roleconfig=None):
 
     Args:
         urlconf(str): Path to urlconf, by default using ROOT_URLCONF
+        roleconfig(dict): Roles to use instead of ROLES in settings
     """
-    from django.conf import settings
-    SKIP_MODULES = settings.REST_FRAMEWORK_ROLES.get("SKIP_MODULES", DEFAULT_SKIP_MODULES)
+    with _patch_lock:
+        patch_default_permission()
+
+        patterns = get_urlpatterns(urlconf)
+
+        if not patterns:
+            post_patch()  # DefaultPermission still needs the exception class
+            return
+
+        # Roles are loaded once and shared by all classes
+        roles = RoleRegistry(roleconfig) if roleconfig else get_role_registry()
+
+        # Patch classes, keeping classes patched earlier
+        patch_classes = collect_classes(patterns)
+        views = dict(plans.current_plan().views)
+        compiled = {}
+        for cls in patch_classes:
+            views[cls] = patch_class(cls, roles, compiled)
+
+        post_patch()
+        install_views(views, roles)
+        _patched_patterns.update(patterns)
+        return patch_classes
+
+
+def patch_patterns(patterns, roleconfig=None):
+    """
+    Patch only what is new in given patterns, keeping everything patched so far
+
+    Patterns seen before and classes already in the plan are skipped, so the work
+    is proportional to what was added. Use it for URLconfs included lazily or
+    per host, or routes registered after startup. Use reload() instead to pick up
+    changes to classes already patched.
+
+    Args:
+        patterns(iterable): URL patterns, e.g. from iter_urlpatterns()
+        roleconfig(dict): Roles to use instead of the ones already in use
+
+    Return:
+        The newly patched classes
+    """
+    with _patch_lock:
+        new_patterns = [pattern for pattern in patterns if pattern not in _patched_patterns]
+        if not new_patterns:
+            return []
+        patch_classes = patch_views(collect_classes(new_patterns), roleconfig)
+        _patched_patterns.update(new_patterns)
+        return patch_classes
+
+
+def patch_views(classes, roleconfig=None):
+    """
+    Patch given view classes that are not yet in the plan, e.g. viewsets generated at runtime
+
+    Return:
+        The newly patched classes
+    """
+    with _patch_lock:
+        patch_default_permission()
+        plan = plans.current_plan()
+        patch_classes = [cls for cls in classes if cls not in plan.views and hasattr(cls, "view_permissions")]
+        if not patch_classes:
+            return []
+
+        if roleconfig:
+            roles = RoleRegistry(roleconfig)
+        else:
+            roles = plan.roles or get_role_registry()
+
+        views = dict(plan.views)
+        compiled = {}
+        for cls in patch_classes:
+            views[cls] = patch_class(cls, roles, compiled)
 
-    # Patch DRF's default permission_classes
+        if plan is plans.EMPTY_PLAN:
+            post_patch()
+        install_views(views, roles, changed=patch_classes, prebuilt=plan.denials)
+        return patch_classes
+
+
+def install_resolver_hook():
+    """
+    Patch the patterns of every URL resolver when it first loads them
+
+    Resolvers load their patterns on first use, and again after clear_url_caches().
+    So URLconfs included lazily or set per request (request.urlconf) get patched
+    before their first request, and routes added later get patched once the URL
+    caches are cleared.
+    """
+    original_url_patterns = URLResolver.__dict__['url_patterns']
+    if getattr(original_url_patterns.func, '_rfr_hook', False):
+        return
+
+    def url_patterns(self):
+        patterns = original_url_patterns.func(self)
+        patch_patterns(iter_urlpatterns(patterns))
+        return patterns
+
+    url_patterns._rfr_hook = True
+    hooked = cached_property(url_patterns)
+    hooked.__set_name__(URLResolver, 'url_patterns')
+    URLResolver.url_patterns = hooked
+
+
+def patch_default_permission():
+    """
+    Make DefaultPermission DRF's default permission_classes
+    """
     from rest_framework.settings import api_settings  # noqa
     api_settings.DEFAULT_PERMISSION_CLASSES = [DefaultPermission]
 
-    patterns = get_urlpatterns(urlconf)
 
-    if not patterns:
-        return
+def collect_classes(patterns):
+    """
+    Get the view classes of patterns that have view_permissions, skipping SKIP_MODULES
+    """
+    from django.conf import settings
+    SKIP_MODULES = settings.REST_FRAMEWORK_ROLES.get("SKIP_MODULES", DEFAULT_SKIP_MODULES)
 
     # Collect classes since multiple patterns might use the same view class
     collected_classes = set()
     for pattern in patterns:
-        
+
         # Skip patching 3rd party entities (e.g. django.contrib.admin)
         skip = False
         for modpattern in SKIP_MODULES:
             if fnmatch.filter([pattern.callback.__module__], modpattern):
-                logger.debug(f"Skip patching {pattern.callback}")
+                logger.debug("Skip patching %s", pattern.callback)
                 skip = True
                 break
         if skip:
             continue
 
         cls = get_view_class(pattern.callback)
-        logger.debug(f'Collecting classes: {pattern} -> {cls}')
+        logger.debug('Collecting classes: %s -> %s', pattern, cls)
         collected_classes.add(cls)
 
     # Get classes that need patching
-    patch_classes = []
-    for cls in collected_classes:
-        if hasattr(cls, "view_permissions"):
-            patch_classes.append(cls)
-
-    # Patch classes
-    for cls in patch_classes:
-
-        # Raise exception if by mistake class has both view_permissions and permission_classes since
-        # they can't work together. Note this will not catch the rare occassion that permission_classes = [DenyAll]
-        permission_classes = getattr(cls, "permission_classes", None)
-        if permission_classes and permission_classes != api_settings.DEFAULT_PERMISSION_CLASSES:
-            raise Misconfigured(f"{cls.__name__}: You can't use both 'permission_classes' and 'view_permissions' in the same class")
-        
-        # Parse permissions for direct lookup
-        cls._view_permissions = parse_view_permissions(cls.view_permissions, roleconfig)
-        
-        # Wrap mentioned request handler in view_permissions.
-        for handler_name, handler_permissions in cls._view_permissions.items():
-            if hasattr(cls, handler_name):
-                handler_permissions = cls._view_permissions[handler_name]
-                old_handler = getattr(cls, handler_name)
-                new_handler = _rfr_wrap_handler(old_handler, handler_permissions)
-                setattr(cls, handler_name, new_handler)
-            else:
-                raise Misconfigured(f"Unknown method '{handler_name}' found in {cls.__name__}.view_permissions")
-
-        # Wrap DRF's check_permissions
-        if hasattr(cls, "check_permissions"):
-            cls.check_permissions = _rfr_wrap_check_permissions(cls.check_permissions)
-
-    post_patch()
-    return patch_classes
+    return [cls for cls in collected_classes if hasattr(cls, "view_permissions")]
+
+
+def reload(roleconfig=None):
+    """
+    Recompile all patched classes from their current view_permissions and settings
+
+    The new plan is built aside and swapped in atomically. Requests being served
+    finish with the plan they started with.
+
+    Args:
+        roleconfig(dict): Roles to use instead of ROLES in settings
+    """
+    with _patch_lock:
+        get_role_registry.cache_clear()
+        get_tenant_resolver.cache_clear()
+        roles = RoleRegistry(roleconfig) if roleconfig else get_role_registry()
+        compiled = {}
+        views = {cls: patch_class(cls, roles, compiled) for cls in plans.current_plan().views}
+        post_patch()
+        install_views(views, roles)
+
+
+def freeze(gc_freeze=False):
+    """
+    Compact the installed plan to share it with forked workers, e.g. gunicorn's with preload_app
+
+    Args:
+        gc_freeze(bool): Also gc.freeze() everything allocated so far, so the garbage
+                         collection of workers never writes to it
+    """
+    with _patch_lock:
+        plan = plans.compact(plans.current_plan())
+        plans.install_plan(plan)
+        for cls in plan.views:
+            cls._view_permissions = plan.views[cls]
+    if gc_freeze:
+        gc.freeze()
+
+
+def install_views(views, roles, changed=None, prebuilt=None):
+    """
+    Install a plan with given compiled views
+
+    Args:
+        changed(list): Classes compiled anew, by default all of them
+        prebuilt(dict): Denials prebuilt already, to be reused
+    """
+    from django.conf import settings
+    prebuilt = dict(prebuilt or {})
+    if settings.REST_FRAMEWORK_ROLES.get("FAST_DENIAL", False):
+        exception_classes = {DEFAULT_EXCEPTION_CLASS}
+        for cls in views if changed is None else changed:
+            for rules in views[cls].values():
+                exception_classes.update(granted for granted, _ in rules if isinstance(granted, type))
+        prebuilt.update(denials.prebuild_all(exception_classes - prebuilt.keys()))
+    plan = plans.PermissionPlan(views, DEFAULT_EXCEPTION_CLASS, prebuilt, roles)
+    plans.install_plan(plan)
+    for cls in plan.views if changed is None else changed:
+        cls._view_permissions = plan.views[cls]
+
+
+def is_wrapped_for(cls, name):
+    """
+    Check if attribute of class is already one of our wrappers made for that class
+    """
+    return getattr(cls.__dict__.get(name), '_rfr_class', None) is cls
+
+
+def get_original(method):
+    """
+    Get the method as it was before any class in the MRO wrapped it
+    """
+    while hasattr(method, '_rfr_original'):
+        method = method._rfr_original
+    return method
+
+
+def patch_class(cls, roles, compiled=None):
+    """
+    Compile view_permissions of class and wrap its handlers. Can be called again
+    for the same class, in which case only newly mentioned handlers get wrapped.
+
+    Every patched class gets its own wrappers, around the original methods. So
+    inheriting a wrapper of a patched base class never wraps it twice.
+
+    Args:
+        compiled(dict): Shared between calls, so classes inheriting the same
+            view_permissions share the compiled ones
+
+    Return:
+        The compiled view_permissions
+    """
+    from rest_framework.settings import api_settings  # noqa
+
+    # Raise exception if by mistake class has both view_permissions and permission_classes since
+    # they can't work together. Note this will not catch the rare occassion that permission_classes = [DenyAll]
+    permission_classes = getattr(cls, "permission_classes", None)
+    if permission_classes and permission_classes != api_settings.DEFAULT_PERMISSION_CLASSES:
+        raise Misconfigured(f"{cls.__name__}: You can't use both 'permission_classes' and 'view_permissions' in the same class")
+
+    # Parse permissions for direct lookup
+    if compiled is None:
+        compiled = {}
+    try:
+        view_permissions = compiled[id(cls.view_permissions)]
+    except KeyError:
+        view_permissions = compiled[id(cls.view_permissions)] = parse_view_permissions(cls.view_permissions, roles)
+
+    # Wrap mentioned request handler in view_permissions.
+    for handler_name, rules in view_permissions.items():
+        if not hasattr(cls, handler_name):
+            raise Misconfigured(f"Unknown method '{handler_name}' found in {cls.__name__}.view_permissions")
+        if any(getattr(granted, 'grant_filter', False) for granted, _ in rules) and not loads_through_queryset(cls, handler_name):
+            raise Misconfigured(f"{cls.__name__}.{handler_name} is overridden, so grant filters can't be sure to apply")
+        if not is_wrapped_for(cls, handler_name):
+            old_handler = get_original(getattr(cls, handler_name))
+            new_handler = _rfr_wrap_handler(old_handler, cls, handler_name)
+            setattr(cls, handler_name, new_handler)
+
+    # Wrap DRF's check_permissions and friends
+    for name, wrapper in (
+        ("check_permissions", _rfr_wrap_check_permissions),
+        ("check_object_permissions", _rfr_wrap_check_object_permissions),
+        ("handle_exception", _rfr_wrap_handle_exception),
+        ("finalize_response", _rfr_wrap_finalize_response),
+        ("get_queryset", _rfr_wrap_get_queryset),
+    ):
+        if hasattr(cls, name) and not is_wrapped_for(cls, name):
+            old_method = get_original(getattr(cls, name))
+            new_method = wrapper(old_method)
+            new_method._rfr_class = cls
+            new_method._rfr_original = old_method
+            setattr(cls, name, new_method)
+
+    return view_permissions
+
 
 
 def get_urlpatterns(urlconf=None):
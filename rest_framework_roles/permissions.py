@@ -3,22 +3,148 @@ Permissions are checked mainly by checking if a _view_permissions exist for give
 """
 
 import logging
+import operator
+import time
+from functools import reduce
 
 from rest_framework_roles.exceptions import Misconfigured
-from rest_framework_roles.granting import GrantChecker, bool_granted, TYPE_FUNCTION
+from rest_framework_roles.parsing import get_tenant_resolver
+from rest_framework_roles.granting import GrantChecker, evaluate_grant, is_object_level, TYPE_FUNCTION
 from rest_framework_roles import exceptions
+from rest_framework_roles import explain
 from rest_framework_roles import patching
+from rest_framework_roles import plans
+from rest_framework_roles import role_sets
+from rest_framework_roles import tracing
 
 MAX_VIEW_REDIRECTION_DEPTH = 3  # Disallow too much depth since it can potentially become expensive
 
-PERMISSIONS_GRANTED_ATTR = "_rfr_permissions_granted"
-VIEWS_CHECKED_ATTR = "_rfr_views_checked"
+CONTEXT_ATTR = "_rfr_context"
+
+# Handlers whose DRF implementation loads the object with get_object() before doing anything,
+# see patching.is_stock_object_handler
+OBJECT_PHASE_HANDLERS = {'retrieve', 'update', 'partial_update', 'destroy'}
 
 logger = logging.getLogger(__name__)
 
 
+UNRESOLVED = object()
+
+
+class PermissionContext():
+    """
+    Permission state of a single request, shared between its redirections
+
+    It lives on the request itself, so it is never shared between threads or
+    asyncio tasks serving different requests. Since a request has one tenant,
+    memoized role results are never shared between tenants either.
+    """
+
+    __slots__ = ('views_checked', 'granted', 'roles', 'grants', 'filters', 'deferred', 'plan', 'role', 'tenant', 'explain',
+                 'role_set')
+
+    def __init__(self):
+        self.views_checked = ()  # Views checked so far; its length is the redirection depth
+        self.granted = ()        # Ids of (interned) view permissions that granted access
+        self.roles = {}          # Memoized role checker results
+        self.grants = {}         # Memoized grant checker results per view instance and handler, see granting.evaluate_grant
+        self.filters = ()        # Q objects of grant filters, see filter_queryset
+        self.deferred = ()       # Checks waiting for the object, see check_object_role_permissions
+        self.plan = None         # Plan pinned for the whole request, see get_plan
+        self.role = None         # Role checker of the first rule matched, see get_matched_role
+        self.tenant = UNRESOLVED  # See get_tenant
+        self.explain = None       # Trace when explained, False when not, None until decided
+        self.role_set = False     # If the stored role set was taken into roles, see load_role_set
+
+    def for_subrequest(self):
+        """
+        New context for a request made on behalf of this one by the same user
+
+        Role checker results, the plan and the tenant are shared. Everything
+        about the views checked is not.
+        """
+        context = PermissionContext()
+        context.roles = self.roles
+        context.role_set = self.role_set
+        context.plan = self.plan
+        context.tenant = self.tenant
+        return context
+
+
+def get_tenant(request):
+    """
+    Get the tenant of the request as given by the TENANT_RESOLVER setting
+
+    Resolved once per request. Anything cached across requests by role should
+    include it in its key. None if no TENANT_RESOLVER is set.
+    """
+    context = get_context(request)
+    if context.tenant is UNRESOLVED:
+        resolver = get_tenant_resolver()
+        context.tenant = resolver(request) if resolver else None
+    return context.tenant
+
+
+def get_plan(request):
+    """
+    Get the permission plan of the request. The first call pins the current plan
+    so the request is served with one plan even if a new one gets installed.
+    """
+    context = get_context(request)
+    if context.plan is None:
+        context.plan = plans.current_plan()
+    return context.plan
+
+
+class Deferred():
+    """
+    Returned instead of granting when the decision waits for the object of the view
+    """
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return "DEFERRED"
+
+
+DEFERRED = Deferred()
+
+
+def get_context(request):
+    """
+    Get the permission context of the request, creating it on first use
+    """
+    try:
+        return request.__dict__[CONTEXT_ATTR]
+    except KeyError:
+        # DRF's request takes over a context prepared on Django's request, e.g. by BatchView
+        http_request = request.__dict__.get('_request')
+        context = http_request.__dict__.get(CONTEXT_ATTR) if http_request is not None else None
+        if context is None:
+            context = PermissionContext()
+        request.__dict__[CONTEXT_ATTR] = context
+        return context
+
+
 def matches_role(request, view, role_checker):
     """ Checks if role evaluates to true """
+    if tracing.exporter is not None:
+        return _traced_matches_role(request, view, role_checker)
+    return _matches_role(request, view, role_checker)
+
+
+def _traced_matches_role(request, view, role_checker):
+    roles = get_plan(request).roles
+    role = roles.by_checker(role_checker) if roles else None
+    attributes = {'role': role.name, 'cost': role.cost} if role else {'role': getattr(role_checker, '__qualname__', repr(role_checker))}
+    with tracing.span('rfr.matches_role', **attributes) as span:
+        matched = _matches_role(request, view, role_checker)
+        span.set_attribute('outcome', bool(matched))
+        return matched
+
+
+def _matches_role(request, view, role_checker):
     if hasattr(role_checker, '__call__'):
         return role_checker(request, view)
     elif type(role_checker) != bool:
@@ -26,42 +152,96 @@ def matches_role(request, view, role_checker):
     return role_checker
 
 
-def _check_role_permissions(request, view, view_instance, view_permissions):
+def _check_role_permissions(request, view, view_instance, view_permissions, obj=None, defer=False, start=0):
+    context = get_context(request)
+    matched_roles = context.roles
+    trace = context.explain or None
+    filters = ()  # Of grant filters matched, applied only if no later rule grants unconditionally
 
-    for permissions in view_permissions:
+    for index in range(start, len(view_permissions)):
+        permissions = view_permissions[index]
         granted, role_checkers = permissions[0], permissions[1:]
 
         # Match any role
         for role_checker in role_checkers:
-            if matches_role(request, view_instance, role_checker):
+            if trace is not None:
+                matched = trace.match_role(request, view_instance, role_checker, matched_roles, matches_role)
+            else:
+                try:
+                    matched = matched_roles[role_checker]
+                except KeyError:
+                    matched = matched_roles[role_checker] = matches_role(request, view_instance, role_checker)
+            if matched:
+                if context.role is None:
+                    context.role = role_checker
 
-                role_name = role_checker.__qualname__ if hasattr(role_checker, '__qualname__') else role_checker
-                logger.debug(f"check_role_permissions:{view.__name__}:{role_name}:{granted}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    role_name = role_checker.__qualname__ if hasattr(role_checker, '__qualname__') else role_checker
+                    logger.debug("check_role_permissions:%s:%s:%s", view.__name__, role_name, granted)
 
                 # Check permission is granted:
                 #   - We only return once we have evaluated positevely a granting rule.
                 #     This is since if this rule doesn't grant permission, the next could.
                 #   - We don't return False here, since *pre_view* will perform any other checks.
+                #   - Object level grants are left for check_object_permissions when the
+                #     handler loads the object anyway. Otherwise we load the object here.
                 #
+                if obj is None and is_object_level(granted):
+                    if defer and not filters:
+                        context.deferred += ((view, view_instance, view_permissions, index),)
+                        if trace is not None:
+                            trace.grant(role_checker, granted, DEFERRED, time.perf_counter())
+                        return DEFERRED
+                    obj = view_instance.get_object()
+
+                if trace is not None:
+                    rule_granted, started = granted, time.perf_counter()
+
                 if type(granted) is bool:
                     pass
-                elif type(granted) is TYPE_FUNCTION:
-                    granted = bool_granted(request, view, granted, view_instance)
-                elif type(granted) is GrantChecker:
-                    granted = granted.evaluate(request, view, view_instance)
+                elif getattr(granted, 'grant_filter', False):
+                    if not hasattr(view_instance, 'get_queryset'):
+                        raise Misconfigured(f"Grant filter {granted.__qualname__} needs a view with get_queryset()")
+                    filters += (granted(request, view_instance),)
+                    if trace is not None:
+                        trace.grant(role_checker, rule_granted, True, started)
+                    break  # A later rule may still grant every row
+                elif type(granted) is TYPE_FUNCTION or type(granted) is GrantChecker:
+                    # Redirections may change what grant checkers read, e.g. view.kwargs
+                    memo = context.grants.get((view_instance, view))
+                    if memo is None:
+                        memo = context.grants[(view_instance, view)] = {}
+                    granted = evaluate_grant(granted, request, view, view_instance, obj, memo)
                 elif issubclass(granted, Exception):
+                    if trace is not None:
+                        trace.grant(role_checker, granted, granted.__name__, started)
                     raise granted
                 else:
                     raise Misconfigured("From v0.4.0+ you need to use 'anyof', 'allof' or similar for multiple grant checks")
 
+                if trace is not None:
+                    trace.grant(role_checker, rule_granted, granted, started)
+
                 if granted:
-                    permissions_granted = getattr(request, PERMISSIONS_GRANTED_ATTR, set())
-                    permissions_granted.add(view_permissions)
-                    setattr(request, PERMISSIONS_GRANTED_ATTR, permissions_granted)
+                    context.granted += (id(view_permissions),)
                     return granted
 
+    if filters:
+        context.filters += (reduce(operator.or_, filters),)
+        context.granted += (id(view_permissions),)
+        return True
+
+
+def load_role_set(request, context):
+    """
+    Take roles from the role set stored at login instead of running role checkers, once per request
+    """
+    if role_sets.config is not None and not context.role_set:
+        context.role_set = True
+        role_sets.prefill(request, context.roles)
+
 
-def check_role_permissions(request, view, view_instance, view_permissions):
+def check_role_permissions(request, view, view_instance, view_permissions, defer=False):
     """
     Check if request is granted access or not
 
@@ -71,27 +251,149 @@ def check_role_permissions(request, view, view_instance, view_permissions):
 
     Args:
         view_permissions(list): List of permissions for the specific request handler
+        defer(bool): Leave object level grants for check_object_role_permissions
 
     Return:
-        Granted permission - True or False. None if no role matched.
+        Granted permission - True or False. None if no role matched. DEFERRED if
+        the decision waits for the object.
     """
     assert isinstance(view_permissions, tuple) or view_permissions == None
 
+    context = get_context(request)
+
     # Catch too deep redirections
-    views_checked = getattr(request, VIEWS_CHECKED_ATTR, set())
-    if view in views_checked:
+    if view in context.views_checked:
         raise Exception(f"Permissions already checked for {view}. Implementation bug?")
-    views_checked.add(view)
-    setattr(request, VIEWS_CHECKED_ATTR, views_checked)
-    if len(views_checked) > MAX_VIEW_REDIRECTION_DEPTH:
+    context.views_checked += (view,)
+    if len(context.views_checked) > MAX_VIEW_REDIRECTION_DEPTH:
         raise Exception(f"Permissions checked too many times for same request: {request}")
 
-    # OPTIMIZATION: Avoid double-checking the same permissions twice
-    permissions_granted = getattr(request, PERMISSIONS_GRANTED_ATTR, None)
-    if permissions_granted and view_permissions in permissions_granted:
+    # OPTIMIZATION: Avoid double-checking the same permissions twice.
+    #               Permissions are interned so identity stands in for the hash.
+    if id(view_permissions) in context.granted:
         return True
 
-    logger.debug(f'Check permissions for {request}..')
+    logger.debug('Check permissions for %s..', request)
+
+    # Decide once per request whether to explain it
+    trace = context.explain
+    if trace is None and explain.config is not None:
+        trace = context.explain = explain.Trace(get_plan(request).roles) if explain.wants_trace(request) else False
+
+    load_role_set(request, context)
 
     # Determine permissions
-    return _check_role_permissions(request, view, view_instance, view_permissions)
\ No newline at end of file
+    if tracing.exporter is None:
+        granted = _check_role_permissions(request, view, view_instance, view_permissions, defer=defer)
+    else:
+        with tracing.span('rfr.check_role_permissions', view=getattr(view, '__qualname__', repr(view))) as span:
+            granted = _check_role_permissions(request, view, view_instance, view_permissions, defer=defer)
+            span.set_attribute('outcome', repr(granted))
+
+    if trace:
+        trace.check(view, granted)
+    return granted
+
+
+def filter_queryset(request, queryset):
+    """
+    Narrow queryset down to the rows granted by grant filters, if any matched
+    """
+    context = request.__dict__.get(CONTEXT_ATTR)
+    if context is not None:
+        for q in context.filters:
+            queryset = queryset.filter(q)
+    return queryset
+
+
+def check_object_role_permissions(request, obj):
+    """
+    Finish the checks that were deferred until the object got loaded
+
+    Return:
+        True if every deferred check grants access
+    """
+    context = get_context(request)
+    deferred, context.deferred = context.deferred, ()
+    for view, view_instance, view_permissions, start in deferred:
+        if id(view_permissions) in context.granted:
+            continue
+        if not _check_role_permissions(request, view, view_instance, view_permissions, obj=obj, start=start):
+            return False
+    return True
+
+
+def decide_role_permissions(request, view_instance, view_permissions):
+    """
+    Decide access without running any grant checkers
+
+    Role checkers are memoized in the request's context like in check_role_permissions.
+
+    Return:
+        True or False when the decision follows from the rules alone. None when it
+        depends on a grant checker (e.g. is_self) and so on the actual request.
+    """
+    decision = _decide_role_permissions(request, view_instance, view_permissions)
+    if decision is True or decision is None:
+        return decision
+    return False
+
+
+def _decide_role_permissions(request, view_instance, view_permissions):
+    """
+    Same as decide_role_permissions but when denied, return the exception class
+    of the rule that denies. False means denied by default.
+    """
+    matched_roles = get_context(request).roles
+    undecided = False
+
+    for granted, role_checker in view_permissions:
+        try:
+            matched = matched_roles[role_checker]
+        except KeyError:
+            matched = matched_roles[role_checker] = matches_role(request, view_instance, role_checker)
+        if not matched:
+            continue
+
+        if type(granted) is bool:
+            if granted:
+                return True
+        elif type(granted) in (TYPE_FUNCTION, GrantChecker):
+            undecided = True
+        elif issubclass(granted, Exception):
+            return None if undecided else granted
+        else:
+            raise Misconfigured("From v0.4.0+ you need to use 'anyof', 'allof' or similar for multiple grant checks")
+
+    return None if undecided else False
+
+
+def get_matched_role(request, view_instance):
+    """
+    Get the role the request is matched to for the handler about to run
+
+    This is the role of the first rule of the handler whose role checker matches,
+    as check_role_permissions would find it. Role checker results are shared with
+    check_role_permissions, so no role checker runs twice.
+
+    Return:
+        The Role from the plan's registry, or None if no role matched
+    """
+    context = get_context(request)
+    if context.role is None:
+        load_role_set(request, context)
+        view_permissions = get_plan(request).view_permissions(view_instance.__class__) or {}
+        handler_name = getattr(view_instance, 'action', None) or request.method.lower()
+        matched_roles = context.roles
+        for _, role_checker in view_permissions.get(handler_name, ()):
+            try:
+                matched = matched_roles[role_checker]
+            except KeyError:
+                matched = matched_roles[role_checker] = matches_role(request, view_instance, role_checker)
+            if matched:
+                context.role = role_checker
+                break
+        else:
+            return None
+    roles = get_plan(request).roles
+    return roles.by_checker(context.role) if roles else None
@@ -0,0 +1,128 @@
+"""
+A plan holds the compiled view_permissions of all patched classes
+
+Wrapped handlers never hold on to permissions themselves but look them up in the
+plan of the request. Hence a new plan can be built while requests are being served
+and swapped in with install_plan(). A request keeps the plan it started with.
+"""
+
+import hashlib
+import sys
+from types import MappingProxyType
+
+
+class PermissionPlan():
+    """
+    Immutable mapping of patched classes to their compiled view_permissions
+    """
+
+    __slots__ = ('views', 'exception_class', 'denials', 'roles', '_version')
+
+    def __init__(self, views, exception_class, denials=None, roles=None):
+        # Classes with the same compiled view_permissions share one mapping
+        shared = {}
+        for lookup in views.values():
+            if id(lookup) not in shared:
+                shared[id(lookup)] = lookup if type(lookup) is MappingProxyType else MappingProxyType(dict(lookup))
+        views = {cls: shared[id(lookup)] for cls, lookup in views.items()}
+        object.__setattr__(self, 'views', MappingProxyType(views))
+        object.__setattr__(self, 'exception_class', exception_class)
+        object.__setattr__(self, 'denials', MappingProxyType(denials or {}))  # See denials module
+        object.__setattr__(self, 'roles', roles)  # RoleRegistry the views were compiled with
+        object.__setattr__(self, '_version', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    @property
+    def version(self):
+        """
+        Hash of the plan's contents, the same in every process serving the same
+        permissions. E.g. for cache keys shared between processes.
+        """
+        if self._version is None:
+            object.__setattr__(self, '_version', describe_plan(self))
+        return self._version
+
+    def view_permissions(self, cls):
+        """
+        Compiled view_permissions in effect for given class, following inheritance
+        """
+        for klass in cls.__mro__:
+            try:
+                return self.views[klass]
+            except KeyError:
+                pass
+        return None
+
+    def handler_permissions(self, cls, handler_name):
+        """
+        Compiled permissions of a handler of a patched class. None if not mentioned.
+        """
+        try:
+            return self.views[cls].get(handler_name)
+        except KeyError:
+            return None
+
+
+def _describe(obj):
+    if type(obj) is bool or obj is None:
+        return repr(obj)
+    scheme = getattr(obj, 'scheme', None)  # GrantChecker
+    if scheme is not None:
+        return f"{scheme}({','.join(_describe(checker) for checker in obj.checkers)})"
+    qualname = getattr(obj, '__qualname__', None)
+    if qualname is None:
+        return repr(obj)
+    return f"{getattr(obj, '__module__', '')}.{qualname}"
+
+
+def describe_plan(plan):
+    """
+    Digest of the compiled permissions, exception class and roles of plan
+    """
+    lines = [_describe(plan.exception_class)]
+    for role in plan.roles or ():
+        lines.append(f"role {role.id} {role.name} {_describe(role.checker)}")
+    for cls, lookup in plan.views.items():
+        for handler_name, rules in lookup.items():
+            described = ';'.join(','.join(_describe(part) for part in rule) for rule in rules)
+            lines.append(f"{_describe(cls)} {handler_name} {described}")
+    lines.sort()
+    return hashlib.sha1('\n'.join(lines).encode()).hexdigest()[:16]
+
+
+def compact(plan):
+    """
+    Copy of plan sharing everything that is equal, for processes forked after patching
+
+    Classes with equal compiled view_permissions share one mapping, even if compiled
+    apart, and handler names are interned. The copy is allocated in one go, so it
+    spans fewer memory pages than a plan built up over time.
+    """
+    shared = {}
+    views = {}
+    for cls, lookup in plan.views.items():
+        items = tuple((sys.intern(name), rules) for name, rules in lookup.items())
+        if items not in shared:
+            shared[items] = MappingProxyType(dict(items))
+        views[cls] = shared[items]
+    return PermissionPlan(views, plan.exception_class, dict(plan.denials), plan.roles)
+
+
+EMPTY_PLAN = PermissionPlan({}, None)
+
+_current_plan = EMPTY_PLAN
+
+
+def current_plan():
+    return _current_plan
+
+
+def install_plan(plan):
+    """
+    Make given plan the one used by new requests. Rebinding a global is atomic.
+    """
+    global _current_plan
+    assert isinstance(plan, PermissionPlan), f"Expected PermissionPlan. Got {plan}"
+    _current_plan = plan
@@ -0,0 +1,209 @@
+"""
+Role sets computed at login, enabled with the ROLE_SETS setting
+
+    REST_FRAMEWORK_ROLES = {
+        'ROLES': 'myproject.roles.ROLES',
+        'ROLE_SETS': 'session',  # Or 'cookie' for a signed cookie
+    }
+
+When a user logs in, every role checker in ROLES runs once and the names of the
+roles matched are stored in the session, or in a signed cookie. Permission checks
+of the user's later requests take the roles from there instead of running role
+checkers. So role checkers used this way should not depend on the view.
+
+Every stored role set carries the version of the user's roles. Versions are kept
+in Django's default cache, so it must be one shared by all processes (not LocMem
+or Dummy). They are bumped with invalidate(user) whenever roles of the user
+change, which has the role set computed again on the next request. Roles stored
+with rest_framework_roles.db do so by themselves.
+"""
+
+import time
+
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.core import signing
+
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles import permissions
+from rest_framework_roles import plans
+
+
+SESSION_KEY = '_rfr_roles'
+COOKIE_NAME = 'rfr_roles'
+SALT = 'rest_framework_roles.role_sets'
+VERSION_KEY = 'rfr:roles:version:'
+PENDING_ATTR = '_rfr_role_set_cookie'  # Cookie value for RoleSetCookieMiddleware to set
+MIDDLEWARE_PATH = 'rest_framework_roles.middleware.RoleSetCookieMiddleware'
+
+config = None  # Role sets are off while None
+
+
+class RoleSetConfig():
+
+    __slots__ = ('store',)
+
+    def __init__(self, store):
+        if store not in ('session', 'cookie'):
+            raise Misconfigured(f"ROLE_SETS must be 'session' or 'cookie', got '{store}'")
+        self.store = store
+
+
+def load(rfr_settings):
+    """
+    Set up role sets from the ROLE_SETS setting
+    """
+    global config
+    store = rfr_settings.get('ROLE_SETS')
+    if not store:
+        config = None
+        user_logged_in.disconnect(dispatch_uid=SALT)
+        user_logged_out.disconnect(dispatch_uid=SALT)
+        return
+    from django.core.cache import caches, DEFAULT_CACHE_ALIAS
+    from django.core.cache.backends.dummy import DummyCache
+    from django.core.cache.backends.locmem import LocMemCache
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache)):
+        raise Misconfigured("ROLE_SETS needs a default cache shared by all processes, since it keeps the versions of roles")
+    config = RoleSetConfig(store)
+    if store == 'cookie':
+        from django.conf import settings
+        if MIDDLEWARE_PATH not in settings.MIDDLEWARE:
+            raise Misconfigured(f"ROLE_SETS 'cookie' needs '{MIDDLEWARE_PATH}' in MIDDLEWARE")
+    user_logged_in.connect(on_login, dispatch_uid=SALT)
+    user_logged_out.connect(on_logout, dispatch_uid=SALT)
+
+
+# ---------------------------------- Versions ---------------------------------
+#
+# Versions are the times of the latest invalidation. One missing from the cache
+# (never set or evicted) starts over from the current time, so role sets stored
+# before are never taken as current.
+#
+# Role checkers may lag behind a change for a while, like stored roles do. So
+# role sets computed within SETTLE_TIME of an invalidation are used but not stored.
+
+SETTLE_TIME = 1.0  # seconds, same as the refresh interval of stored roles
+
+
+def _get_version(key):
+    from django.core.cache import cache
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_version(user_pk):
+    """
+    Version of the roles of given user, changing on every invalidate
+    """
+    return (_get_version(VERSION_KEY), _get_version(VERSION_KEY + str(user_pk)))
+
+
+def is_settled(version):
+    return time.time_ns() - max(version) >= SETTLE_TIME * 1e9
+
+
+def invalidate(user=None):
+    """
+    Have stored role sets of user computed again. Without a user, those of everyone.
+    """
+    from django.core.cache import cache
+    cache.set(VERSION_KEY if user is None else VERSION_KEY + str(user.pk), time.time_ns(), None)
+
+
+# ---------------------------------- Storing ----------------------------------
+
+
+def _tenant(request):
+    tenant = permissions.get_tenant(request)
+    return '' if tenant is None else str(tenant)
+
+
+def compute(request, roles, version=None):
+    """
+    Role set of the request's user, running every role checker once
+    """
+    user = request.user
+    if version is None:
+        version = get_version(user.pk)
+    matched = {}
+    names = []
+    for role in roles:
+        if role.checker not in matched:
+            matched[role.checker] = permissions.matches_role(request, None, role.checker)
+        if matched[role.checker]:
+            names.append(role.name)
+    return {'user': str(user.pk), 'tenant': _tenant(request), 'version': list(version), 'roles': names}
+
+
+def read(request):
+    if config.store == 'session':
+        session = getattr(request, 'session', None)
+        return session.get(SESSION_KEY) if session is not None else None
+    value = request.COOKIES.get(COOKIE_NAME)
+    if not value:
+        return None
+    from django.conf import settings
+    try:
+        return signing.loads(value, salt=SALT, max_age=settings.SESSION_COOKIE_AGE)
+    except signing.BadSignature:
+        return None
+
+
+def write(request, role_set):
+    if config.store == 'session':
+        session = getattr(request, 'session', None)
+        if session is not None:
+            session[SESSION_KEY] = role_set
+        return
+    value = signing.dumps(role_set, salt=SALT, compress=True) if role_set else ''
+    http_request = getattr(request, '_request', request)
+    http_request.__dict__[PENDING_ATTR] = value
+
+
+def on_login(sender, request, user, **kwargs):
+    roles = plans.current_plan().roles
+    if request is None or not roles:
+        return
+    if not hasattr(request, 'user'):  # Role checkers need it, login() only updates it
+        request.user = user
+    version = get_version(user.pk)
+    if is_settled(version):
+        write(request, compute(request, roles, version))
+
+
+def on_logout(sender, request, user, **kwargs):
+    if request is not None and config.store == 'cookie':
+        write(request, None)
+
+
+def prefill(request, matched_roles):
+    """
+    Fill memoized role checker results from the stored role set of the request's user
+
+    A role set that is missing, of another user or tenant, or outdated is computed
+    again and stored.
+    """
+    roles = permissions.get_plan(request).roles
+    user = request.user
+    if not roles or not user.is_authenticated:
+        return
+    role_set = read(request)
+    version = get_version(user.pk)
+    if (
+        not isinstance(role_set, dict)
+        or role_set.get('user') != str(user.pk)
+        or role_set.get('tenant') != _tenant(request)
+        or role_set.get('version') != list(version)
+    ):
+        role_set = compute(request, roles, version)
+        if is_settled(version):
+            write(request, role_set)
+    names = set(role_set['roles'])
+    stored = {}
+    for role in roles:
+        stored[role.checker] = stored.get(role.checker, False) or role.name in names
+    for role_checker, matched in stored.items():
+        matched_roles.setdefault(role_checker, matched)  # Keep what ran already
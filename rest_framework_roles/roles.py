@@ -1,5 +1,9 @@
+from collections.abc import Mapping
+
 from django.contrib.auth import get_user_model
 
+from rest_framework_roles import decorators
+
 
 def is_user(request, view):
     return isinstance(request.user, get_user_model())
@@ -15,3 +19,61 @@ def is_admin(request, view):
 
 def is_staff(request, view):
     return request.user.is_staff
+
+
+# ----------------------------- Claim-based roles -----------------------------
+#
+# Role checkers reading the claims of a token (e.g. a JWT payload), so roles are
+# decided without loading the user. They only look at the request, never the view.
+
+
+def auth_claims(request):
+    """
+    Claims of request.auth, being a mapping or a token with a mapping `payload` (as in simplejwt)
+    """
+    auth = getattr(request, 'auth', None)
+    if auth is None or isinstance(auth, Mapping):
+        return auth
+    payload = getattr(auth, 'payload', None)
+    return payload if isinstance(payload, Mapping) else None
+
+
+def has_claim(claim, value=True, claims=auth_claims):
+    """
+    Role checker for a claim equal to given value
+
+    Args:
+        claims(callable): Called as claims(request) to get the claims, None if there are none
+    """
+    def is_claimed(request, view):
+        found = claims(request)
+        return found is not None and claim in found and found[claim] == value
+    is_claimed.__qualname__ = f"has_claim({claim!r}, {value!r})"
+    is_claimed.cost = decorators.DEFAULT_COST
+    return is_claimed
+
+
+def claim_role(role_name, claim='roles', claims=auth_claims):
+    """
+    Role checker for a role listed in a claim
+
+    The claim can be a list of roles or a space separated string, like OAuth's 'scope'.
+    """
+    def is_claimed_role(request, view):
+        found = claims(request)
+        if found is None:
+            return False
+        listed = found.get(claim) or ()
+        if isinstance(listed, str):
+            listed = listed.split()
+        return role_name in listed
+    is_claimed_role.__qualname__ = f"claim_role({role_name!r})"
+    is_claimed_role.cost = decorators.DEFAULT_COST
+    return is_claimed_role
+
+
+def claim_roles(*role_names, claim='roles', claims=auth_claims):
+    """
+    Role checkers for given roles listed in a claim, to be merged in ROLES
+    """
+    return {role_name: claim_role(role_name, claim, claims) for role_name in role_names}
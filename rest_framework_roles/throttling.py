@@ -0,0 +1,141 @@
+"""
+Throttling by the role a request is matched to
+
+    class ReportViewSet(ModelViewSet):
+        throttle_classes = [RoleRateThrottle]
+        view_permissions = {
+            'list': {'anon': True, 'user': True, 'partner': True},
+        }
+        view_throttle_rates = {
+            'anon': '10/min',
+            'user': '100/min',
+            # No entry (or None) means no throttling for the role
+        }
+"""
+
+import collections
+import threading
+import time
+
+from rest_framework.throttling import BaseThrottle
+
+from rest_framework_roles.permissions import get_matched_role, get_tenant
+
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a rate like '100/min' to (number of requests, duration in seconds)
+    """
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+class InMemoryThrottleStore():
+    """
+    Sliding window of request timestamps per key, local to the process
+    """
+
+    SWEEP_EVERY = 1000  # hits
+
+    def __init__(self):
+        self._history = {}
+        self._durations = {}
+        self._hits = 0
+        self._lock = threading.Lock()
+
+    def hit(self, key, num_requests, duration, now):
+        """
+        Record a request if allowed
+
+        Return:
+            None if allowed, otherwise seconds to wait
+        """
+        with self._lock:
+            self._hits += 1
+            if self._hits % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+            history = self._history.get(key)
+            if history is None:
+                history = self._history[key] = collections.deque()
+                self._durations[key] = duration
+            while history and history[0] <= now - duration:
+                history.popleft()
+            if len(history) >= num_requests:
+                return duration - (now - history[0])
+            history.append(now)
+            return None
+
+    def _sweep(self, now):
+        """
+        Forget keys that went quiet, so idle clients don't pile up
+        """
+        for key, history in list(self._history.items()):
+            if not history or history[-1] <= now - self._durations[key]:
+                del self._history[key]
+                del self._durations[key]
+
+    def clear(self):
+        with self._lock:
+            self._history.clear()
+            self._durations.clear()
+
+
+class CacheThrottleStore():
+    """
+    Same as InMemoryThrottleStore but kept in Django's cache so it is shared between processes
+    """
+
+    def __init__(self, alias='default', key_prefix='rest_framework_roles.throttle'):
+        self.alias = alias
+        self.key_prefix = key_prefix
+
+    def hit(self, key, num_requests, duration, now):
+        from django.core.cache import caches
+        cache = caches[self.alias]
+        cache_key = f"{self.key_prefix}:{key}"
+        history = [timestamp for timestamp in cache.get(cache_key, []) if timestamp > now - duration]
+        if len(history) >= num_requests:
+            return duration - (now - history[0])
+        history.append(now)
+        cache.set(cache_key, history, duration)
+        return None
+
+
+class RoleRateThrottle(BaseThrottle):
+    """
+    Throttle with the rate set for the matched role in the view's view_throttle_rates
+
+    The role is the one the permission check matches the request to (see
+    permissions.get_matched_role), so no role checker runs twice.
+    """
+
+    store = InMemoryThrottleStore()
+    timer = time.time
+
+    def __init__(self):
+        self._wait = None
+
+    def allow_request(self, request, view):
+        rates = getattr(view, 'view_throttle_rates', None)
+        if not rates:
+            return True
+        role = get_matched_role(request, view)
+        rate = rates.get(role.name) if role else None
+        if rate is None:
+            return True
+
+        num_requests, duration = parse_rate(rate)
+        self._wait = self.store.hit(self.get_cache_key(request, view, role), num_requests, duration, self.timer())
+        return self._wait is None
+
+    def get_cache_key(self, request, view, role):
+        user = request.user
+        ident = user.pk if user and user.is_authenticated else self.get_ident(request)
+        scope = getattr(view, 'throttle_scope', None) or view.__class__.__qualname__
+        return f"{get_tenant(request)!r}:{scope}:{role.name}:{ident}"
+
+    def wait(self):
+        return self._wait
@@ -0,0 +1,169 @@
+"""
+Optional tracing of permission evaluation, enabled with the TRACING setting
+
+    REST_FRAMEWORK_ROLES = {
+        'ROLES': 'myproject.roles.ROLES',
+        'TRACING': 'opentelemetry',  # Or 'memory', or a dotted path to an exporter
+    }
+
+Spans are made for check_role_permissions, every role checker that runs and every
+GrantChecker evaluated. Instrumented code only checks that `exporter` is None when
+tracing is off, so there is next to no overhead.
+"""
+
+import threading
+import time
+
+from django.utils.module_loading import import_string
+
+from rest_framework_roles.exceptions import Misconfigured
+
+
+exporter = None  # Tracing is off while None
+
+
+class Span():
+    """
+    A finished or ongoing span of InMemoryExporter
+    """
+
+    __slots__ = ('name', 'attributes', 'parent', 'start', 'end_time', '_exporter')
+
+    def __init__(self, exporter, name, attributes, parent):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self._exporter = exporter
+        self.end_time = None
+        self.start = time.perf_counter()
+
+    @property
+    def duration(self):
+        """ Seconds the span lasted. None while ongoing """
+        return None if self.end_time is None else self.end_time - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.end_time = time.perf_counter()
+        self.attributes['duration_ms'] = self.duration * 1000
+        self._exporter._end(self)
+
+    def __repr__(self):
+        return f"Span({self.name!r}, {self.attributes!r})"
+
+
+class InMemoryExporter():
+    """
+    Keeps finished spans in a list, in the order they ended. Meant for tests.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._local = threading.local()
+
+    def start_span(self, name, attributes):
+        parent = getattr(self._local, 'current', None)
+        span = self._local.current = Span(self, name, attributes, parent)
+        return span
+
+    def _end(self, span):
+        self._local.current = span.parent
+        self.spans.append(span)
+
+    def clear(self):
+        self.spans = []
+
+
+class OpenTelemetrySpan():
+    """
+    An OpenTelemetry span made current until it ends, so nested spans become its children
+    """
+
+    __slots__ = ('span', 'start', '_token', '_context')
+
+    def __init__(self, span, context, token):
+        self.span = span
+        self.start = time.perf_counter()
+        self._context = context
+        self._token = token
+
+    def set_attribute(self, key, value):
+        self.span.set_attribute(key, value)
+
+    def end(self):
+        self.span.set_attribute('duration_ms', (time.perf_counter() - self.start) * 1000)
+        self._context.detach(self._token)
+        self.span.end()
+
+
+class OpenTelemetryExporter():
+    """
+    Emits spans through OpenTelemetry's global tracer provider
+    """
+
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import context, trace
+        except ImportError:
+            raise Misconfigured("Tracing with 'opentelemetry' needs the opentelemetry-api package")
+        self._context = context
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer('rest_framework_roles')
+
+    def start_span(self, name, attributes):
+        span = self.tracer.start_span(name, attributes=attributes)
+        token = self._context.attach(self._trace.set_span_in_context(span))
+        return OpenTelemetrySpan(span, self._context, token)
+
+
+EXPORTERS = {
+    'memory': InMemoryExporter,
+    'opentelemetry': OpenTelemetryExporter,
+}
+
+
+class span():
+    """
+    Context manager for a span of the current exporter. Only use while tracing is on.
+    """
+
+    __slots__ = ('name', 'attributes', 'span')
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.span = exporter.start_span(self.name, self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.span.set_attribute('outcome', exc_type.__name__)
+        self.span.end()
+
+
+def set_exporter(new_exporter):
+    """
+    Start tracing with given exporter, or stop with None
+    """
+    global exporter
+    exporter = new_exporter
+
+
+def load_exporter(config):
+    """
+    Make the exporter for the TRACING setting
+    """
+    tracing = config.get('TRACING')
+    if not tracing:
+        return None
+    if isinstance(tracing, str):
+        tracing = EXPORTERS[tracing] if tracing in EXPORTERS else import_string(tracing)
+    if isinstance(tracing, type):
+        tracing = tracing()
+    if not hasattr(tracing, 'start_span'):
+        raise Misconfigured(f"TRACING must be 'memory', 'opentelemetry' or an exporter with start_span(), got '{tracing}'")
+    return tracing
@@ -0,0 +1,207 @@
+"""
+Ready-made views
+"""
+
+import hashlib
+import importlib
+import io
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from rest_framework_roles import authorization
+from rest_framework_roles.patching import get_view_class
+from rest_framework_roles.permissions import CONTEXT_ATTR, get_context, get_plan, get_tenant
+
+logger = logging.getLogger(__name__)
+
+
+def iter_routes(urlpatterns, prefix=''):
+    """
+    Like patching.iter_urlpatterns but also yields the full route of each pattern
+    """
+    for entity in urlpatterns:
+        route = prefix + str(entity.pattern)
+        if hasattr(entity, 'url_patterns'):
+            yield from iter_routes(entity.url_patterns, route)
+        else:
+            yield route, entity
+
+
+def get_endpoint_actions(callback):
+    """
+    Map each HTTP method of a patched view callback to the action it ends up in
+    """
+    if not hasattr(callback, 'view_class') and not hasattr(callback, 'cls'):
+        return None
+    cls = get_view_class(callback)
+    if not hasattr(cls, '_view_permissions'):
+        return None
+    actions = getattr(callback, 'actions', None)  # ViewSets
+    if actions is None:
+        actions = {method: method for method in cls.http_method_names if hasattr(cls, method)}
+    return cls, actions
+
+
+class PermissionsView(APIView):
+    """
+    Lists the endpoints and actions the current user may call
+
+    An action maps to true when granted, or to null when it depends on the request
+    (e.g. is_self). Responses are cached per tenant and set of roles, so every user
+    with the same roles shares one entry, and carry an ETag for cheap revalidation.
+
+    Role checkers are evaluated against this view, so they should not depend on it.
+    """
+
+    permission_classes = [AllowAny]
+    cache_alias = 'default'
+    cache_timeout = 300
+    cache_key_prefix = 'rest_framework_roles.permissions'
+    urlconf = None  # Defaults to ROOT_URLCONF
+
+    def get(self, request):
+        auth_request = authorization.make_request(request)
+        plan = get_plan(auth_request)
+        roles = authorization.get_roles(auth_request, self, plan.roles)
+
+        cache = caches[self.cache_alias]
+        cache_key = self.get_cache_key(roles, plan, get_tenant(auth_request))
+        cached = cache.get(cache_key)
+        if cached is None:
+            data = self.get_endpoints(auth_request)
+            etag = '"' + hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest() + '"'
+            cached = (etag, data)
+            cache.set(cache_key, cached, self.cache_timeout)
+        etag, data = cached
+
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+    def get_cache_key(self, roles, plan, tenant):
+        return f"{self.cache_key_prefix}:{plan.version}:{tenant!r}:{','.join(sorted(roles))}"
+
+    def get_endpoints(self, request):
+        urlconf = self.urlconf or importlib.import_module(settings.ROOT_URLCONF)
+        endpoints = []
+        actions = []
+        for route, pattern in iter_routes(urlconf.urlpatterns):
+            endpoint_actions = get_endpoint_actions(pattern.callback)
+            if endpoint_actions:
+                cls, methods = endpoint_actions
+                endpoints.append((route, pattern.name, cls, methods))
+                actions.extend((cls, action) for action in methods.values())
+
+        decisions = authorization.authorize_request(request, actions)
+
+        data = []
+        for route, name, cls, methods in endpoints:
+            allowed = {
+                method: decisions[(cls, action)]
+                for method, action in methods.items()
+                if decisions[(cls, action)] is not False
+            }
+            if allowed:
+                data.append({'route': route, 'name': name, 'actions': allowed})
+        return {'endpoints': data}
+
+
+class BatchView(APIView):
+    """
+    Runs many API calls of the current user in one request
+
+        POST {"requests": [{"method": "GET", "path": "/users/1/"}, {"method": "PATCH", "path": "/users/1/", "body": {..}}]}
+
+    Responds with a list of {"status": .., "body": ..} in the same order. Every call
+    is checked against the permissions of its own view, but role checkers run once
+    for the whole batch. So role checkers used this way should not depend on the view.
+    """
+
+    permission_classes = [AllowAny]  # Each call is checked by its own view
+    max_requests = 50
+
+    def post(self, request):
+        calls = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(calls, list):
+            return Response({'detail': "Expected a list in 'requests'"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(calls) > self.max_requests:
+            return Response({'detail': f"At most {self.max_requests} requests per batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Pin plan and tenant so every call shares them
+        context = get_context(request)
+        get_plan(request)
+        get_tenant(request)
+
+        return Response([self.dispatch_call(request, call, context) for call in calls])
+
+    def dispatch_call(self, request, call, context):
+        if not isinstance(call, dict) or not isinstance(call.get('path'), str):
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'detail': "Expected an object with a 'path'"}}
+        subrequest = self.make_subrequest(request, call)
+        subrequest.__dict__[CONTEXT_ATTR] = context.for_subrequest()
+        try:
+            match = resolve(subrequest.path_info, urlconf=getattr(request, 'urlconf', None))
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'body': {'detail': "Not found."}}
+        if issubclass(getattr(match.func, 'cls', object), BatchView):  # Would fan out to max_requests ** depth calls
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'detail': "Batches can not be nested"}}
+        subrequest.resolver_match = match
+
+        try:
+            response = match.func(subrequest, *match.args, **match.kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        except Exception:
+            logger.exception("BatchView: %s %s failed", subrequest.method, subrequest.path)
+            return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'body': None}
+        return {'status': response.status_code, 'body': self.get_body(response)}
+
+    def make_subrequest(self, request, call):
+        """
+        Django request for call, made by the same (already authenticated) user
+        """
+        http_request = request._request
+        url = urlsplit(call['path'])
+        body = json.dumps(call['body']).encode() if call.get('body') is not None else b''
+
+        subrequest = HttpRequest()
+        subrequest.method = str(call.get('method', 'GET')).upper()
+        subrequest.path = subrequest.path_info = url.path
+        subrequest.META = {
+            **http_request.META,
+            'REQUEST_METHOD': subrequest.method,
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+        }
+        subrequest.GET = QueryDict(url.query)
+        subrequest.COOKIES = http_request.COOKIES
+        subrequest._body = body
+        subrequest._stream = io.BytesIO(body)
+        subrequest._read_started = False
+        subrequest.user = request.user
+        subrequest._force_auth_user = request.user  # So DRF doesn't authenticate again
+        subrequest._force_auth_token = request.auth
+        subrequest._dont_enforce_csrf_checks = True  # The batch itself passed CSRF checks
+        if hasattr(http_request, 'session'):
+            subrequest.session = http_request.session
+        return subrequest
+
+    def get_body(self, response):
+        if hasattr(response, 'data'):
+            return response.data
+        content = getattr(response, 'content', b'')
+        if response.get('Content-Type', '').startswith('application/json'):
+            return json.loads(content or b'null')
+        return content.decode(response.charset or 'utf-8')
@@ -49,7 +49,11 @@ setup(
     description='Role-based permissions for Django REST Framework and vanilla Django.',
     author='Johan Hanssen Seferidis',
     author_email='manossef@gmail.com',
-    packages=['rest_framework_roles'],
+    packages=[
+        'rest_framework_roles',
+        'rest_framework_roles.db',
+        'rest_framework_roles.db.migrations',
+    ],
     url='https://github.com/Pithikos/rest-framework-roles',
     license='LICENSE',
     long_description=open('README.md').read(),
@@ -0,0 +1,112 @@
+from unittest.mock import MagicMock
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import path, include
+
+import rest_framework as drf
+import rest_framework.routers
+import rest_framework.viewsets
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_roles import patching
+from rest_framework_roles.authorization import authorize
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.granting import is_self
+from rest_framework_roles.roles import is_admin, is_user, is_anon
+from .fixtures import admin, user, anon
+from .utils import UserSerializer
+
+
+CALLS = []
+
+
+def is_counted_admin(request, view):
+    CALLS.append(view)
+    return is_admin(request, view)
+
+
+ROLES = {
+    'admin': is_counted_admin,
+    'user': is_user,
+    'anon': is_anon,
+}
+
+
+class UserViewSet(drf.viewsets.ModelViewSet):
+    serializer_class = UserSerializer
+    queryset = User.objects.all()
+    view_permissions = {
+        'list': {'admin': True},
+        'retrieve': {'user': is_self, 'admin': True},
+        'create': {'anon': True, 'user': drf.exceptions.PermissionDenied},
+    }
+
+
+class GroupViewSet(drf.viewsets.ViewSet):
+    view_permissions = {
+        'list': {'user': True},
+        'destroy': {'admin': True},
+    }
+
+    def list(self, request):
+        pass
+
+    def destroy(self, request, pk=None):
+        pass
+
+
+class NotPatchedViewSet(drf.viewsets.ViewSet):
+    pass
+
+
+router = drf.routers.DefaultRouter()
+router.register(r'users', UserViewSet, basename='user')
+router.register(r'groups', GroupViewSet, basename='group')
+urlpatterns = [path('', include(router.urls))]
+
+
+ACTIONS = [
+    (UserViewSet, 'list'),
+    (UserViewSet, 'retrieve'),
+    (UserViewSet, 'create'),
+    (UserViewSet, 'destroy'),
+    (GroupViewSet, 'list'),
+    (GroupViewSet, 'destroy'),
+]
+
+
+class TestAuthorize:
+
+    def setup(self):
+        urlconf = MagicMock()
+        urlconf.urlpatterns = urlpatterns
+        patching.patch(urlconf, ROLES)
+        CALLS.clear()
+
+    def test_decisions(self, user, anon, admin):
+        assert authorize(user, ACTIONS) == {
+            (UserViewSet, 'list'): False,
+            (UserViewSet, 'retrieve'): None,  # depends on the object
+            (UserViewSet, 'create'): False,
+            (UserViewSet, 'destroy'): False,  # not in view_permissions
+            (GroupViewSet, 'list'): True,
+            (GroupViewSet, 'destroy'): False,
+        }
+        assert authorize(admin, ACTIONS)[(UserViewSet, 'retrieve')] is True
+        assert authorize(admin, ACTIONS)[(GroupViewSet, 'destroy')] is True
+        assert authorize(anon, ACTIONS)[(UserViewSet, 'create')] is True
+
+    def test_role_checked_once(self, admin):
+        authorize(admin, ACTIONS)
+        assert len(CALLS) == 1
+        assert isinstance(CALLS[0], UserViewSet)
+
+    def test_request_given(self, admin):
+        request = APIRequestFactory().get('/')
+        request.user = admin
+        assert authorize(request, ACTIONS)[(GroupViewSet, 'destroy')] is True
+
+    def test_not_patched(self, admin):
+        with pytest.raises(Misconfigured):
+            authorize(admin, [(NotPatchedViewSet, 'list')])
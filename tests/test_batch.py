@@ -0,0 +1,88 @@
+from unittest import mock
+
+import pytest
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.viewsets
+from rest_framework.response import Response
+
+from rest_framework_roles import patching, permissions
+from rest_framework_roles.views import BatchView
+from .fixtures import admin, user
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    view_permissions = {
+        'list': {'anon': False, 'user': True},
+        'create': {'admin': True},
+    }
+
+    def list(self, request):
+        return Response({'reports': [], 'page': request.query_params.get('page')})
+
+    def create(self, request):
+        return Response(request.data, status=201)
+
+
+class PlainViewSet(drf.viewsets.ViewSet):
+    view_permissions = {'list': {'user': True}}
+
+    def list(self, request):
+        return HttpResponse('plain')
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list', 'post': 'create'})),
+    path('plain/', PlainViewSet.as_view({'get': 'list'})),
+    path('batch/', BatchView.as_view()),
+]
+
+
+@pytest.mark.urls(__name__)
+class TestBatchView:
+
+    def setup(self):
+        patching.patch()
+
+    def batch(self, client, user, *calls):
+        client.force_authenticate(user)
+        response = client.post('/batch/', {'requests': list(calls)}, format='json')
+        assert response.status_code == 200
+        return response.json()
+
+    def test_calls_checked_by_own_view(self, client, user):
+        results = self.batch(client, user,
+            {'method': 'GET', 'path': '/reports/?page=2'},
+            {'method': 'POST', 'path': '/reports/', 'body': {'title': 'Q1'}},
+            {'method': 'GET', 'path': '/plain/'},
+            {'method': 'GET', 'path': '/missing/'},
+        )
+        assert results == [
+            {'status': 200, 'body': {'reports': [], 'page': '2'}},
+            {'status': 403, 'body': {'detail': 'You do not have permission to perform this action.'}},
+            {'status': 200, 'body': 'plain'},
+            {'status': 404, 'body': {'detail': 'Not found.'}},
+        ]
+
+    def test_admin_may_create(self, client, admin):
+        results = self.batch(client, admin, {'method': 'POST', 'path': '/reports/', 'body': {'title': 'Q1'}})
+        assert results == [{'status': 201, 'body': {'title': 'Q1'}}]
+
+    def test_role_checkers_run_once_per_batch(self, client, user):
+        with mock.patch.object(permissions, 'matches_role', wraps=permissions.matches_role) as matches_role:
+            self.batch(client, user, *[{'method': 'GET', 'path': '/reports/'}] * 10, {'method': 'GET', 'path': '/plain/'})
+        checkers = [call.args[2] for call in matches_role.call_args_list]
+        assert len(checkers) == len(set(checkers)) == 2  # anon and user
+
+    def test_invalid_batches(self, client, user):
+        client.force_authenticate(user)
+        assert client.post('/batch/', {'requests': 'nope'}, format='json').status_code == 400
+        calls = [{'path': '/reports/'}] * (BatchView.max_requests + 1)
+        assert client.post('/batch/', {'requests': calls}, format='json').status_code == 400
+        assert self.batch(client, user, {'method': 'GET'})[0]['status'] == 400
+
+    def test_nested_batches_refused(self, client, user):
+        results = self.batch(client, user, {'method': 'POST', 'path': '/batch/', 'body': {'requests': [{'path': '/reports/'}]}})
+        assert results == [{'status': 400, 'body': {'detail': 'Batches can not be nested'}}]
@@ -0,0 +1,119 @@
+import pytest
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.authentication
+import rest_framework.viewsets
+
+from rest_framework_roles import patching
+from rest_framework_roles.authorization import authorize
+from rest_framework_roles.roles import auth_claims, claim_role, claim_roles, has_claim
+
+
+class TokenUser():
+    """ User known only from the token, as with stateless JWT authentication """
+    is_authenticated = True
+    is_anonymous = False
+
+
+class Token():
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class ClaimsAuthentication(drf.authentication.BaseAuthentication):
+    """ Takes claims from the header as key=value pairs, with roles separated by spaces """
+
+    def authenticate(self, request):
+        header = request.META.get('HTTP_X_CLAIMS')
+        if header is None:
+            return None
+        payload = dict(pair.split('=') for pair in header.split(';'))
+        payload['staff'] = payload.get('staff') == 'yes'
+        return TokenUser(), Token(payload)
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    authentication_classes = (ClaimsAuthentication,)
+    view_permissions = {
+        'list': {'editor': True, 'staff': True},
+    }
+
+    def list(self, request):
+        return HttpResponse()
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list'})),
+]
+
+ROLES = {
+    'anon': lambda request, view: request.user.is_anonymous,
+    'staff': has_claim('staff'),
+    **claim_roles('editor', 'viewer'),
+}
+
+
+def make_request(auth):
+    from rest_framework.test import APIRequestFactory
+    request = APIRequestFactory().get('/')
+    request.auth = auth
+    return request
+
+
+def test_claims_from_auth():
+    assert auth_claims(make_request({'roles': []})) == {'roles': []}
+    assert auth_claims(make_request(Token({'roles': []}))) == {'roles': []}
+    assert auth_claims(make_request('opaque')) is None
+    assert auth_claims(make_request(None)) is None
+
+
+@pytest.mark.parametrize("roles,matched", (
+    (['editor', 'viewer'], True),
+    ('viewer editor', True),
+    ('editors', False),
+    (None, False),
+))
+def test_claim_role(roles, matched):
+    assert claim_role('editor')(make_request({'roles': roles}), None) is matched
+
+
+def test_claim_role_with_accessor():
+    is_editor = claim_role('editor', claim='groups', claims=lambda request: request.META)
+    request = make_request(None)
+    request.META['groups'] = ['editor']
+    assert is_editor(request, None)
+
+
+def test_has_claim():
+    assert has_claim('tier', 'gold')(make_request({'tier': 'gold'}), None)
+    assert not has_claim('tier', 'gold')(make_request({'tier': 'silver'}), None)
+    assert not has_claim('tier', 'gold')(make_request(None), None)
+
+
+def test_claim_roles_are_cheap():
+    assert all(checker.cost == 0 for checker in ROLES.values() if hasattr(checker, 'cost'))
+
+
+@pytest.mark.urls(__name__)
+class TestClaimRoles():
+
+    def setup(self):
+        patching.patch(roleconfig=ROLES)
+
+    def get(self, client, claims):
+        # Without the db fixture any query fails the test
+        return client.get('/reports/', HTTP_X_CLAIMS=claims)
+
+    def test_granted_without_queries(self, client):
+        assert self.get(client, 'roles=viewer editor').status_code == 200
+        assert self.get(client, 'roles=viewer;staff=yes').status_code == 200
+
+    def test_denied_without_queries(self, client):
+        assert self.get(client, 'roles=viewer').status_code == 403
+
+    def test_authorized_from_authenticated_django_request(self):
+        request = make_request(Token({'roles': 'editor'}))
+        request.user = TokenUser()
+        assert authorize(request, [(ReportViewSet, 'list')]) == {(ReportViewSet, 'list'): True}
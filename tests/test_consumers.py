@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+from django.contrib.auth.models import AnonymousUser, User
+from rest_framework.exceptions import NotAuthenticated
+
+from rest_framework_roles import patching
+from rest_framework_roles.consumers import ConsumerPermissionsMixin, AsyncConsumerPermissionsMixin
+from rest_framework_roles.decorators import grant_checker
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.granting import is_self_object
+from rest_framework_roles.parsing import get_role_registry
+from rest_framework_roles.roles import is_admin, is_anon
+
+
+class JsonWebsocketConsumer():
+    """ Just what the mixins need of Channels' consumer """
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.sent = []
+
+    def send_json(self, content):
+        self.sent.append(content)
+
+
+class AsyncJsonWebsocketConsumer(JsonWebsocketConsumer):
+
+    async def send_json(self, content):
+        self.sent.append(content)
+
+
+def is_user(request, view):
+    is_user.calls += 1
+    return request.user.is_authenticated
+is_user.calls = 0
+
+
+def is_own_room(request, view):
+    return request.data.get('room') == request.user.username
+
+
+ROLES = {
+    'admin': is_admin,
+    'user': is_user,
+    'anon': is_anon,
+}
+
+PERMISSIONS = {
+    'subscribe': {'user': True, 'anon': NotAuthenticated},
+    'publish': {'admin': True, 'user': is_own_room},
+}
+
+
+class ChatConsumer(ConsumerPermissionsMixin, JsonWebsocketConsumer):
+    consumer_permissions = PERMISSIONS
+
+    def receive_json(self, content):
+        self.received.append(content['type'])
+
+    def __init__(self, scope):
+        super().__init__(scope)
+        self.received = []
+
+
+class LoggingChatConsumer(ChatConsumer):
+
+    def receive_json(self, content):
+        self.received.append('logged')
+        super().receive_json(content)
+
+
+class BaseChatConsumer(JsonWebsocketConsumer):
+
+    def __init__(self, scope):
+        super().__init__(scope)
+        self.received = []
+
+    def receive_json(self, content):
+        self.received.append(content['type'])
+
+
+class InheritingChatConsumer(ConsumerPermissionsMixin, BaseChatConsumer):
+    consumer_permissions = PERMISSIONS
+
+
+class AsyncChatConsumer(AsyncConsumerPermissionsMixin, AsyncJsonWebsocketConsumer):
+    consumer_permissions = PERMISSIONS
+
+    def __init__(self, scope):
+        super().__init__(scope)
+        self.received = []
+
+    async def receive_json(self, content):
+        self.received.append(content['type'])
+
+
+def connect(cls, user):
+    return cls({'type': 'websocket', 'path': '/ws/chat/', 'user': user, 'headers': [(b'x-tenant', b'a')]})
+
+
+@pytest.fixture
+def alice():
+    return User(id=1, username='alice')
+
+
+@pytest.fixture(autouse=True)
+def roles(settings):
+    settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'ROLES': 'tests.test_consumers.ROLES'}
+    get_role_registry.cache_clear()
+    patching.patch()  # No views, so consumers use the roles of settings
+    yield
+    get_role_registry.cache_clear()
+
+
+class TestConsumerPermissions():
+
+    def test_granted_messages_received(self, alice):
+        consumer = connect(ChatConsumer, alice)
+        consumer.receive_json({'type': 'subscribe'})
+        consumer.receive_json({'type': 'publish', 'room': 'alice'})
+        assert consumer.received == ['subscribe', 'publish']
+        assert consumer.sent == []
+
+    def test_denied_messages_answered(self, alice):
+        consumer = connect(ChatConsumer, alice)
+        consumer.receive_json({'type': 'publish', 'room': 'bob'})
+        consumer.receive_json({'type': 'unknown'})
+        consumer.receive_json(['no type'])
+        assert consumer.received == []
+        assert [message['status'] for message in consumer.sent] == [403, 403, 403]
+        assert consumer.sent[0]['type'] == 'permission_denied'
+        assert consumer.sent[0]['message_type'] == 'publish'
+
+    def test_explicit_exception(self):
+        consumer = connect(ChatConsumer, AnonymousUser())
+        consumer.receive_json({'type': 'subscribe'})
+        assert consumer.sent[0]['status'] == 401
+
+    def test_roles_checked_once_per_connection(self, alice):
+        calls = is_user.calls
+        consumer = connect(ChatConsumer, alice)
+        for _ in range(3):
+            consumer.receive_json({'type': 'subscribe'})
+        assert is_user.calls == calls + 1
+
+        consumer.invalidate_permissions()
+        consumer.receive_json({'type': 'subscribe'})
+        consumer.rfr_invalidate({'type': 'rfr.invalidate'})
+        consumer.receive_json({'type': 'subscribe'})
+        assert is_user.calls == calls + 3
+
+    def test_headers_as_meta(self, alice):
+        consumer = connect(ChatConsumer, alice)
+        assert consumer.get_connection_request().META['HTTP_X_TENANT'] == 'a'
+
+    def test_subclass_checked_once(self, alice):
+        calls = is_user.calls
+        consumer = connect(LoggingChatConsumer, alice)
+        consumer.receive_json({'type': 'subscribe'})
+        assert consumer.received == ['logged', 'subscribe']
+        assert is_user.calls == calls + 1
+
+    def test_inherited_handler_checked(self, alice):
+        consumer = connect(InheritingChatConsumer, alice)
+        consumer.receive_json({'type': 'subscribe'})
+        consumer.receive_json({'type': 'unknown'})
+        assert consumer.received == ['subscribe']
+        assert consumer.sent[0]['message_type'] == 'unknown'
+        assert BaseChatConsumer.receive_json is BaseChatConsumer.__dict__['receive_json']
+
+    def test_async(self, alice):
+        consumer = connect(AsyncChatConsumer, alice)
+
+        async def receive():
+            await consumer.receive_json({'type': 'subscribe'})
+            await consumer.receive_json({'type': 'publish', 'room': 'bob'})
+            await consumer.rfr_invalidate({'type': 'rfr.invalidate'})
+        asyncio.run(receive())
+        assert consumer.received == ['subscribe']
+        assert consumer.sent[0]['status'] == 403
+
+    def test_object_level_grants_refused(self, alice):
+        class ObjectConsumer(ChatConsumer):
+            consumer_permissions = {'publish': {'user': is_self_object}}
+        with pytest.raises(Misconfigured):
+            connect(ObjectConsumer, alice).receive_json({'type': 'publish'})
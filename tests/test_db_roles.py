@@ -0,0 +1,99 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_roles.db.models import RoleAssignment, RoleChange
+from rest_framework_roles.db.roles import RoleSnapshot, stored_role, stored_roles, assign_role, revoke_role
+from rest_framework_roles.parsing import RoleRegistry, parse_view_permissions
+from .fixtures import user, anon, admin
+
+
+def make_request(user):
+    request = APIRequestFactory().get('/')
+    request.user = user
+    return request
+
+
+@pytest.fixture
+def snapshot():
+    return RoleSnapshot(refresh_interval=0)
+
+
+def test_assign_and_revoke_logged(user):
+    assign_role(user, 'partner')
+    assign_role(user, 'partner')
+    revoke_role(user, 'partner')
+    revoke_role(user, 'partner')
+    assert not RoleAssignment.objects.exists()
+    assert list(RoleChange.objects.order_by('id').values_list('role', 'assigned')) == [
+        ('partner', True),
+        ('partner', False),
+    ]
+
+
+def test_snapshot_loads_then_refreshes_incrementally(user, admin, snapshot):
+    assign_role(user, 'partner')
+    assert snapshot.roles(user.pk) == {'partner'}
+    assert snapshot.roles(admin.pk) == set()
+
+    assign_role(admin, 'partner')
+    revoke_role(user, 'partner')
+    assign_role(user, 'editor')
+    with CaptureQueriesContext(connection) as queries:
+        assert snapshot.roles(user.pk) == {'editor'}
+    assert len(queries) == 1
+    assert 'rest_framework_roles_db_rolechange' in queries[0]['sql']
+    assert snapshot.roles(admin.pk) == {'partner'}
+    assert snapshot.version == RoleChange.objects.latest('id').id
+
+
+def test_snapshot_applies_changes_committed_out_of_order(user, snapshot):
+    assert snapshot.roles(user.pk) == set()
+    version = snapshot.version
+    RoleChange.objects.create(id=version + 2, user=user, role='editor', assigned=True)
+    assert snapshot.roles(user.pk) == {'editor'}
+    assert set(snapshot.gaps) == {version + 1}
+
+    RoleChange.objects.create(id=version + 1, user=user, role='partner', assigned=True)
+    assert snapshot.roles(user.pk) == {'editor', 'partner'}
+    assert not snapshot.gaps
+    assert snapshot.version == version + 2
+
+
+def test_snapshot_reloaded_for_old_gaps(user, snapshot, monkeypatch):
+    assert snapshot.roles(user.pk) == set()
+    RoleChange.objects.create(id=snapshot.version + 2, user=user, role='editor', assigned=True)
+    RoleAssignment.objects.create(user=user, role='editor')
+    assert snapshot.roles(user.pk) == {'editor'}
+
+    RoleAssignment.objects.create(user=user, role='partner')  # Its change was rolled back
+    monkeypatch.setattr('rest_framework_roles.db.roles.GAP_TIMEOUT', 0)
+    assert snapshot.roles(user.pk) == {'editor', 'partner'}
+    assert not snapshot.gaps
+
+
+def test_snapshot_refresh_interval(user):
+    snapshot = RoleSnapshot(refresh_interval=3600)
+    assert snapshot.roles(user.pk) == set()
+    assign_role(user, 'partner')
+    with CaptureQueriesContext(connection) as queries:
+        assert snapshot.roles(user.pk) == set()
+    assert not queries
+
+
+def test_stored_role_checkers(user, anon, snapshot):
+    assign_role(user, 'partner')
+    is_partner = stored_role('partner', snapshot)
+    assert is_partner(make_request(user), None)
+    assert not is_partner(make_request(anon), None)
+    assert not stored_role('editor', snapshot)(make_request(user), None)
+
+
+def test_stored_roles_parsed_like_any_role(snapshot):
+    roles = stored_roles('partner', 'editor', snapshot=snapshot)
+    registry = RoleRegistry(roles)
+    assert registry['partner'].checker is roles['partner']
+    lookup = parse_view_permissions({'list': {'partner': True, 'editor': False}}, registry)
+    assert lookup['list'] == ((True, roles['partner']), (False, roles['editor']))
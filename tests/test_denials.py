@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+import pytest
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.exceptions
+import rest_framework.renderers
+import rest_framework.viewsets
+from rest_framework.response import Response
+
+from rest_framework_roles import patching, plans
+from rest_framework_roles.denials import prebuild
+from .fixtures import admin, user, anon
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    view_permissions = {
+        'list': {'admin': True, 'user': drf.exceptions.NotFound, 'anon': drf.exceptions.NotAuthenticated},
+        'create': {'admin': True},
+        'destroy,update': {'admin': True},
+    }
+
+    def list(self, request):
+        return HttpResponse()
+
+    def create(self, request):
+        raise drf.exceptions.PermissionDenied("Custom detail")
+
+    def destroy(self, request):
+        raise drf.exceptions.PermissionDenied(detail='Account locked')
+
+    def update(self, request):
+        raise drf.exceptions.NotFound(code='gone')
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list', 'post': 'create', 'delete': 'destroy', 'put': 'update'})),
+]
+
+
+def test_prebuild():
+    denial = prebuild(drf.exceptions.PermissionDenied)
+    assert denial.status == 403
+    assert denial.bodies['application/json'] == (
+        'application/json', b'{"detail":"You do not have permission to perform this action."}'
+    )
+    assert 'text/html' not in denial.bodies  # Browsable API needs a view
+    assert prebuild(drf.exceptions.NotAuthenticated) is None
+    assert prebuild(ValueError) is None
+
+
+@pytest.mark.urls(__name__)
+class TestFastDenial:
+
+    @pytest.fixture(autouse=True)
+    def fast_denial(self, settings):
+        settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'FAST_DENIAL': True}
+        patching.patch()
+
+    def test_prebuilt_for_default_and_rule_exceptions(self):
+        assert set(plans.current_plan().denials) == {drf.exceptions.PermissionDenied, drf.exceptions.NotFound}
+
+    @pytest.mark.parametrize("usertype,method,expected_status", [
+        ('user', 'get', 404),
+        ('anon', 'get', 403),
+        ('user', 'post', 403),
+        ('admin', 'post', 403),  # Custom detail raised by the view
+        ('admin', 'delete', 403),  # Custom detail given as keyword
+        ('admin', 'put', 404),  # Custom code given as keyword
+    ])
+    def test_same_response(self, usertype, method, expected_status, client, user, anon, admin):
+        client.force_authenticate(locals()[usertype])
+        fast_response = getattr(client, method)('/reports/')
+        plans.install_plan(plans.PermissionPlan(plans.current_plan().views, plans.current_plan().exception_class))
+        response = getattr(client, method)('/reports/')
+        assert fast_response.status_code == response.status_code == expected_status
+        assert fast_response.content == response.content
+        assert fast_response['Content-Type'] == response['Content-Type']
+
+    def test_keyword_detail_not_prebuilt(self, client, admin):
+        client.force_authenticate(admin)
+        assert client.delete('/reports/').json() == {'detail': 'Account locked'}
+
+    def test_exception_handler_skipped(self, client, user):
+        client.force_authenticate(user)
+        with patch('rest_framework.views.set_rollback') as set_rollback:
+            response = client.get('/reports/', HTTP_ACCEPT='application/json')
+        assert response.status_code == 404
+        assert not isinstance(response, Response)
+        assert set_rollback.called
+
+    def test_own_exception_handler_not_prebuilt(self, client, user):
+        client.force_authenticate(user)
+        handler = lambda exc, context: Response({'denied': True}, status=exc.status_code)
+        with patch.object(ReportViewSet, 'get_exception_handler', return_value=handler):
+            response = client.get('/reports/', HTTP_ACCEPT='application/json')
+        assert response.json() == {'denied': True}
+
+    def test_own_renderers_not_prebuilt(self, client, user):
+        client.force_authenticate(user)
+        with patch.object(ReportViewSet, 'renderer_classes', [drf.renderers.JSONRenderer]):
+            response = client.get('/reports/', HTTP_ACCEPT='application/json')
+        assert response.status_code == 404
+        assert isinstance(response, Response)
+
+    def test_browsable_api_not_prebuilt(self, client, user):
+        client.force_authenticate(user)
+        response = client.get('/reports/', HTTP_ACCEPT='text/html')
+        assert response.status_code == 404
+        assert b'<html' in response.content
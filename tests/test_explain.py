@@ -0,0 +1,110 @@
+import json
+import logging
+
+import pytest
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.viewsets
+
+from rest_framework_roles import explain, patching
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.granting import allof
+from .fixtures import user, admin
+
+
+def is_weekday(request, view):
+    return True
+
+
+def is_workhour(request, view):
+    return True
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    view_permissions = {
+        'list': {'anon': False, 'user': allof(is_weekday, is_workhour)},
+    }
+
+    def list(self, request):
+        return HttpResponse()
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list'})),
+]
+
+
+def explained(response):
+    return json.loads(response[explain.RESPONSE_HEADER])
+
+
+@pytest.mark.urls(__name__)
+class TestExplain:
+
+    @pytest.fixture(autouse=True)
+    def explain_settings(self, settings):
+        settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'EXPLAIN': {'SAMPLE_RATE': 0}}
+        patching.patch()
+
+    def test_flagged_request_explained(self, client, admin):
+        client.force_authenticate(admin)
+        response = client.get('/reports/', HTTP_X_EXPLAIN_PERMISSIONS='1')
+        assert response.status_code == 200
+        trace = explained(response)
+        assert trace['role'] == 'user'
+        steps = trace['steps']
+        assert [step.get('role') for step in steps] == ['anon', 'user', 'user', None]
+        assert steps[0]['matched'] is False
+        assert steps[0]['cached'] is False
+        assert steps[1]['matched'] is True
+        assert steps[2]['grant'] == 'allof'
+        assert steps[2]['granted'] is True
+        assert steps[3] == {'check': 'ReportViewSet.list', 'outcome': 'True'}
+        assert all(step['ms'] >= 0 for step in steps[:3])
+
+    def test_denied_request_explained(self, client, settings):
+        settings.DEBUG = True
+        response = client.get('/reports/', HTTP_X_EXPLAIN_PERMISSIONS='1')
+        assert response.status_code == 403
+        trace = explained(response)
+        assert trace['role'] == 'anon'
+        assert trace['steps'][1]['granted'] is False
+
+    def test_flag_ignored_for_non_staff(self, client, user, caplog):
+        client.force_authenticate(user)
+        with caplog.at_level(logging.INFO, logger=explain.__name__):
+            response = client.get('/reports/', HTTP_X_EXPLAIN_PERMISSIONS='1')
+        assert response.status_code == 200
+        assert explain.RESPONSE_HEADER not in response
+        assert not caplog.records
+
+    def test_trace_hidden_from_non_staff(self, client, user, settings, caplog):
+        settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'EXPLAIN': {'SAMPLE_RATE': 1}}
+        patching.reload()
+        client.force_authenticate(user)
+        with caplog.at_level(logging.INFO, logger=explain.__name__):
+            response = client.get('/reports/')
+        assert response.status_code == 200
+        assert explain.RESPONSE_HEADER not in response
+        assert caplog.records
+
+    def test_unflagged_request_not_explained(self, client, admin):
+        client.force_authenticate(admin)
+        response = client.get('/reports/')
+        assert explain.RESPONSE_HEADER not in response
+
+    def test_sampled_request_explained(self, client, admin, settings):
+        settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'EXPLAIN': {'SAMPLE_RATE': 1, 'REQUEST_HEADER': None}}
+        patching.reload()
+        client.force_authenticate(admin)
+        response = client.get('/reports/')
+        assert explained(response)['role'] == 'user'
+
+
+def test_invalid_settings():
+    with pytest.raises(Misconfigured):
+        explain.load({'EXPLAIN': {'SAMPLE_RATE': 2}})
+    with pytest.raises(Misconfigured):
+        explain.load({'EXPLAIN': {'RATE': 0.1}})
@@ -0,0 +1,121 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, include
+
+import rest_framework as drf
+import rest_framework.routers
+import rest_framework.viewsets
+
+from rest_framework_roles import patching
+from rest_framework_roles.decorators import grant_filter
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.granting import is_self, allof, anyof, not_
+from rest_framework_roles.parsing import parse_view_permissions, get_role_registry
+from .fixtures import admin, user, test_user1, test_user2
+from .utils import UserSerializer
+
+
+@grant_filter
+def is_self_filter(request, view):
+    return Q(pk=request.user.pk)
+
+
+class UserViewSet(drf.viewsets.ModelViewSet):
+    serializer_class = UserSerializer
+    queryset = User.objects.all()
+    view_permissions = {
+        'list,retrieve': {'admin': True, 'user': is_self_filter},
+    }
+
+
+class IsSelfUserViewSet(UserViewSet):
+    view_permissions = {
+        'retrieve': {'user': is_self},
+    }
+
+
+class FilterFirstUserViewSet(UserViewSet):
+    view_permissions = {
+        'list,retrieve': {'user': is_self_filter, 'admin': True},  # Admins are users too
+    }
+
+
+router = drf.routers.DefaultRouter()
+router.register(r'users', UserViewSet, basename='user')
+router.register(r'is_self_users', IsSelfUserViewSet, basename='is_self_user')
+router.register(r'filter_first_users', FilterFirstUserViewSet, basename='filter_first_user')
+urlpatterns = [
+    path('', include(router.urls)),
+]
+
+
+@pytest.mark.urls(__name__)
+class TestGrantFilters:
+
+    def setup(self):
+        patching.patch()
+
+    def get(self, client, user, url):
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        return response, len(queries)
+
+    def test_own_object(self, client, test_user1):
+        response, queries = self.get(client, test_user1, f'/users/{test_user1.id}/')
+        assert response.status_code == 200
+        _, is_self_queries = self.get(client, test_user1, f'/is_self_users/{test_user1.id}/')
+        assert queries == is_self_queries - 1
+
+    def test_other_object_denied_without_loading_it(self, client, test_user1, test_user2):
+        response, queries = self.get(client, test_user1, f'/users/{test_user2.id}/')
+        assert response.status_code == 403
+        assert queries == 1
+
+    def test_list_narrowed(self, client, test_user1, test_user2):
+        response, _ = self.get(client, test_user1, '/users/')
+        assert [row['username'] for row in response.json()] == ['test_user1']
+
+    def test_other_roles_unfiltered(self, client, admin, test_user1):
+        response, _ = self.get(client, admin, f'/users/{test_user1.id}/')
+        assert response.status_code == 200
+        response, _ = self.get(client, admin, '/users/')
+        assert len(response.json()) == 2
+
+    def test_later_unconditional_rule_unfiltered(self, client, admin, test_user1):
+        response, _ = self.get(client, admin, f'/filter_first_users/{test_user1.id}/')
+        assert response.status_code == 200
+        response, _ = self.get(client, admin, '/filter_first_users/')
+        assert len(response.json()) == 2
+        response, _ = self.get(client, test_user1, '/filter_first_users/')
+        assert [row['username'] for row in response.json()] == ['test_user1']
+
+
+class TestMisusedGrantFilters:
+
+    @pytest.mark.parametrize("granted", (
+        anyof(is_self_filter, is_self),
+        allof(True, is_self_filter),
+        not_(is_self_filter),
+    ))
+    def test_not_combined(self, granted):
+        with pytest.raises(Misconfigured):
+            parse_view_permissions({'retrieve': {'user': granted}})
+
+    def test_not_on_create(self):
+        with pytest.raises(Misconfigured):
+            parse_view_permissions({'list,create': {'user': is_self_filter}})
+
+    def test_not_on_overridden_handler(self):
+        class OverridingViewSet(drf.viewsets.ModelViewSet):
+            queryset = User.objects.all()
+            view_permissions = {'destroy': {'user': is_self_filter}}
+
+            def destroy(self, request, *args, **kwargs):
+                User.objects.filter(pk=kwargs['pk']).delete()
+
+        with pytest.raises(Misconfigured):
+            patching.patch_class(OverridingViewSet, get_role_registry())
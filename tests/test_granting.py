@@ -2,7 +2,8 @@ import pytest
 from django.conf import settings
 from django.contrib.auth.models import User
 
-from rest_framework_roles.granting import is_self, anyof, allof
+from rest_framework_roles.granting import is_self, is_self_lookup, is_self_object, anyof, allof, not_, fold_grant, evaluate_grant
+from rest_framework_roles.decorators import grant_checker
 from rest_framework_roles import patching
 from .fixtures import anon, user, admin, test_user1, test_user2, test_user3
 from .utils import assert_allowed, assert_disallowed, UserSerializer
@@ -14,8 +15,10 @@ from .utils import assert_allowed, assert_disallowed, UserSerializer
 import rest_framework.routers
 import rest_framework.permissions
 import rest_framework.viewsets
+import rest_framework.decorators
 import rest_framework as drf
 from django.urls import path, include
+from django.http import HttpResponse
 
 
 class UserViewSet(drf.viewsets.ModelViewSet):
@@ -31,8 +34,95 @@ class UserViewSet(drf.viewsets.ModelViewSet):
     }
 
 
+@grant_checker(object_level=True)
+def is_same_username(request, view, obj):
+    return request.user.username == obj.username
+
+
+class ObjectLevelViewSet(drf.viewsets.ModelViewSet):
+    serializer_class = UserSerializer
+    queryset = User.objects.all()
+
+    view_permissions = {
+        'retrieve': {'test_user1': is_self_object, 'test_user2': is_self},
+        'partial_update': {'test_user1': allof(is_same_username, True)},
+        'destroy': {'test_user1': is_self_object},
+        'username': {'test_user1': is_self_object},
+    }
+
+    destroyed = []
+
+    def destroy(self, request, *args, **kwargs):
+        # Never loads the object
+        self.destroyed.append(kwargs['pk'])
+        return HttpResponse()
+
+    @drf.decorators.action(detail=True)
+    def username(self, request, pk=None):
+        return HttpResponse(self.get_object().username)
+
+
+class LookupViewSet(drf.viewsets.ModelViewSet):
+    serializer_class = UserSerializer
+    queryset = User.objects.all()
+
+    view_permissions = {
+        'retrieve': {'test_user1': is_self_lookup, 'test_user2': is_self},
+    }
+
+
+class UsernameLookupViewSet(LookupViewSet):
+    lookup_field = 'username'
+
+
+def is_owner(request, view):
+    is_owner.calls += 1
+    return request.user.username == 'test_user1'
+is_owner.calls = 0
+
+
+def is_weekday(request, view):
+    return True
+
+
+class SharedGrantsViewSet(drf.viewsets.ViewSet):
+    view_permissions = {
+        'list': {
+            'test_user2': allof(is_weekday, not_(is_owner)),
+            'user': anyof(allof(is_weekday, is_owner), is_owner),
+        }
+    }
+
+    def list(self, request):
+        return HttpResponse()
+
+
+def is_own_pk(request, view):
+    return str(view.kwargs.get('pk')) == str(request.user.pk)
+
+
+class SwapViewSet(drf.viewsets.ModelViewSet):
+    serializer_class = UserSerializer
+    queryset = User.objects.all()
+
+    view_permissions = {
+        'retrieve': {'user': is_own_pk},
+        'swap': {'user': is_own_pk, 'admin': True},  # Other rules, so retrieve is checked again
+    }
+
+    @drf.decorators.action(detail=True)
+    def swap(self, request, pk=None):
+        self.kwargs['pk'] = request.query_params['to']  # Redirects to another object
+        return self.retrieve(request)
+
+
 router = drf.routers.DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
+router.register(r'shared', SharedGrantsViewSet, basename='shared')
+router.register(r'object_level', ObjectLevelViewSet, basename='object_level')
+router.register(r'lookup', LookupViewSet, basename='lookup')
+router.register(r'username_lookup', UsernameLookupViewSet, basename='username_lookup')
+router.register(r'swap', SwapViewSet, basename='swap')
 urlpatterns = [
     path('', include(router.urls)),
 ]
@@ -53,4 +143,126 @@ class TestUserAPI():
     def test_explicit_exception(self, test_user3, client):
         client.force_authenticate(user=test_user3)
         resp = client.get('/users/')
-        assert resp.status_code == 404
\ No newline at end of file
+        assert resp.status_code == 404
+
+@pytest.mark.urls(__name__)
+class TestObjectLevelGrants():
+
+    def setup(self):
+        patching.patch()
+
+    def test_object_loaded_once(self, test_user1, test_user2):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as object_level_queries:
+            assert_allowed(test_user1, get=f'/object_level/{test_user1.id}/')
+        with CaptureQueriesContext(connection) as is_self_queries:  # is_self loads the object itself
+            assert_allowed(test_user2, get=f'/object_level/{test_user2.id}/')
+        assert len(object_level_queries) == len(is_self_queries) - 1
+
+    def test_object_level_denies(self, test_user1, test_user2):
+        assert_disallowed(test_user1, get=f'/object_level/{test_user2.id}/')
+        assert_disallowed(test_user1, patch=f'/object_level/{test_user2.id}/', data={'username': 'x'})
+        assert_allowed(test_user1, patch=f'/object_level/{test_user1.id}/', data={'username': 'x'})
+
+    def test_handler_not_loading_object_denied_before_running(self, test_user1, test_user2, client):
+        ObjectLevelViewSet.destroyed.clear()
+        client.force_authenticate(user=test_user1)
+        assert client.delete(f'/object_level/{test_user2.id}/').status_code == 403
+        assert ObjectLevelViewSet.destroyed == []
+        assert client.delete(f'/object_level/{test_user1.id}/').status_code == 200
+        assert ObjectLevelViewSet.destroyed == [str(test_user1.id)]
+
+    def test_object_loaded_eagerly_for_other_handlers(self, test_user1, test_user2):
+        assert_allowed(test_user1, get=f'/object_level/{test_user1.id}/username/')
+        assert_disallowed(test_user1, get=f'/object_level/{test_user2.id}/username/')
+
+
+@pytest.mark.urls(__name__)
+class TestSelfLookup():
+
+    def setup(self):
+        patching.patch()
+
+    def test_object_not_loaded_for_pk(self, test_user1, test_user2):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as lookup_queries:
+            assert_allowed(test_user1, get=f'/lookup/{test_user1.id}/')
+        with CaptureQueriesContext(connection) as is_self_queries:
+            assert_allowed(test_user2, get=f'/lookup/{test_user2.id}/')
+        assert len(lookup_queries) == len(is_self_queries) - 1
+
+    def test_denies_others(self, test_user1, test_user2):
+        assert_disallowed(test_user1, get=f'/lookup/{test_user2.id}/')
+        assert_disallowed(test_user1, get='/lookup/notanumber/')
+
+    def test_object_not_loaded_for_session_user(self, client, test_user1):
+        from unittest import mock
+        from rest_framework_roles import granting
+        client.force_login(test_user1)  # request.user is a lazy object then
+        with mock.patch.object(granting, 'is_self', wraps=is_self) as fallback:
+            assert client.get(f'/lookup/{test_user1.id}/').status_code == 200
+        assert not fallback.called
+
+    def test_falls_back_to_object_for_other_lookups(self, test_user1, test_user2):
+        assert_allowed(test_user1, get=f'/username_lookup/{test_user1.username}/')
+        assert_disallowed(test_user1, get=f'/username_lookup/{test_user2.username}/')
+
+
+class TestGrantDAG():
+
+    def test_identical_combinations_are_one_object(self):
+        assert anyof(is_self, allof(is_weekday, is_owner)) is anyof(is_self, allof(is_weekday, is_owner))
+        assert not_(is_owner) is not_(is_owner)
+
+    @pytest.mark.parametrize("granted,folded", (
+        (anyof(False, True), True),
+        (allof(True, True), True),
+        (allof(True, False, is_owner), False),
+        (allof(True, is_owner), is_owner),
+        (anyof(False, is_owner, is_owner), is_owner),
+        (not_(True), False),
+        (not_(not_(is_owner)), is_owner),
+        (allof(is_weekday, allof(is_owner, True)), allof(is_weekday, is_owner)),
+        (anyof(not_(allof(True, False)), is_owner), True),
+    ))
+    def test_constants_folded(self, granted, folded):
+        assert fold_grant(granted) is folded
+
+    def test_shared_nodes_evaluated_once(self):
+        calls = []
+
+        def is_tracked(request, view):
+            calls.append(1)
+            return False
+
+        memo = {}
+        granted = anyof(allof(is_weekday, is_tracked), not_(is_tracked), is_tracked)
+        assert evaluate_grant(granted, None, None, None, memo=memo) is True
+        assert evaluate_grant(allof(is_weekday, is_tracked), None, None, None, memo=memo) is False
+        assert len(calls) == 1
+
+    def test_short_circuits(self):
+        def explode(request, view):
+            raise AssertionError("Should not run")
+        assert evaluate_grant(anyof(is_weekday, explode), None, None, None) is True
+        assert evaluate_grant(allof(not_(is_weekday), explode), None, None, None) is False
+
+
+@pytest.mark.urls(__name__)
+class TestSharedGrants():
+
+    def setup(self):
+        patching.patch()
+
+    def test_grant_evaluated_once_across_roles(self, test_user1, test_user2):
+        is_owner.calls = 0
+        assert_allowed(test_user1, get='/shared/')
+        assert is_owner.calls == 1
+        assert_allowed(test_user2, get='/shared/')
+        assert is_owner.calls == 2
+
+    def test_grants_evaluated_again_after_redirection(self, test_user1, test_user2):
+        assert_allowed(test_user1, get=f'/swap/{test_user1.id}/swap/?to={test_user1.id}')
+        assert_disallowed(test_user1, get=f'/swap/{test_user1.id}/swap/?to={test_user2.id}')
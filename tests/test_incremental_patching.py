@@ -0,0 +1,71 @@
+from unittest import mock
+
+import pytest
+from django.http import HttpResponse
+from django.urls import clear_url_caches, path
+
+import rest_framework as drf
+import rest_framework.viewsets
+
+from rest_framework_roles import patching, plans
+from .fixtures import admin, user
+from .utils import assert_allowed, assert_disallowed
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    view_permissions = {'list': {'admin': True}}
+
+    def list(self, request):
+        return HttpResponse()
+
+
+class InvoiceViewSet(drf.viewsets.ViewSet):
+    view_permissions = {'list': {'user': True}}
+
+    def list(self, request):
+        return HttpResponse()
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list'})),
+]
+
+invoice_patterns = [
+    path('invoices/', InvoiceViewSet.as_view({'get': 'list'})),
+]
+
+
+@pytest.mark.urls(__name__)
+class TestIncrementalPatching:
+
+    def setup(self):
+        patching.patch()
+
+    def test_only_new_patterns_patched(self):
+        with mock.patch.object(patching, 'patch_class', wraps=patching.patch_class) as patch_class:
+            assert patching.patch_patterns(urlpatterns + invoice_patterns) == [InvoiceViewSet]
+        assert [call.args[0] for call in patch_class.call_args_list] == [InvoiceViewSet]
+        assert set(plans.current_plan().views) == {ReportViewSet, InvoiceViewSet}
+
+    def test_seen_patterns_skipped(self):
+        patching.patch_patterns(invoice_patterns)
+        plan = plans.current_plan()
+        assert patching.patch_patterns(urlpatterns + invoice_patterns) == []
+        assert plans.current_plan() is plan
+
+    def test_generated_viewset(self, user, admin):
+        GeneratedViewSet = type('GeneratedViewSet', (ReportViewSet,), {'view_permissions': {'list': {'user': True}}})
+        assert patching.patch_views([GeneratedViewSet, ReportViewSet]) == [GeneratedViewSet]
+        assert plans.current_plan().view_permissions(GeneratedViewSet)['list'][0].role_checker.__name__ == 'is_user'
+
+    def test_resolver_hook(self, user):
+        patching.install_resolver_hook()
+        urlpatterns.extend(invoice_patterns)
+        try:
+            clear_url_caches()
+            assert_allowed(user, get='/invoices/')
+            assert InvoiceViewSet in plans.current_plan().views
+            assert_disallowed(user, get='/reports/')
+        finally:
+            del urlpatterns[1:]
+            clear_url_caches()
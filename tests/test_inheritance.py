@@ -0,0 +1,80 @@
+from unittest import mock
+
+import pytest
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.viewsets
+
+from rest_framework_roles import patching, permissions, plans
+from .fixtures import admin, user
+from .utils import assert_allowed, assert_disallowed
+
+
+class BaseReportViewSet(drf.viewsets.ViewSet):
+    view_permissions = {'list': {'admin': True}}
+
+    def list(self, request):
+        return HttpResponse()
+
+
+class UserReportViewSet(BaseReportViewSet):
+    view_permissions = {'list': {'user': True}}
+
+
+class OtherReportViewSet(BaseReportViewSet):
+    pass
+
+
+class ExtendedReportViewSet(BaseReportViewSet):
+    view_permissions = {'list': {'user': True}}
+
+    def list(self, request):
+        return super().list(request)
+
+
+urlpatterns = [
+    path('reports/', BaseReportViewSet.as_view({'get': 'list'})),
+    path('user_reports/', UserReportViewSet.as_view({'get': 'list'})),
+    path('other_reports/', OtherReportViewSet.as_view({'get': 'list'})),
+    path('extended_reports/', ExtendedReportViewSet.as_view({'get': 'list'})),
+]
+
+
+@pytest.mark.urls(__name__)
+class TestInheritance:
+
+    def setup(self):
+        patching.patch()
+
+    def test_subclass_uses_own_permissions(self, user, admin):
+        assert_disallowed(user, get='/reports/')
+        assert_allowed(user, get='/user_reports/')
+        assert_allowed(admin, get='/other_reports/')
+        assert_disallowed(user, get='/other_reports/')
+
+    def test_checked_once_per_request(self, user):
+        with mock.patch.object(permissions, 'check_role_permissions', wraps=permissions.check_role_permissions) as check:
+            assert_allowed(user, get='/user_reports/')
+        assert check.call_count == 1
+
+    def test_super_call_checked_once(self, user):
+        with mock.patch.object(permissions, 'check_role_permissions', wraps=permissions.check_role_permissions) as check, \
+                mock.patch.object(permissions, 'matches_role', wraps=permissions.matches_role) as matches_role:
+            assert_allowed(user, get='/extended_reports/')
+        assert check.call_count == 1
+        checkers = [call.args[2] for call in matches_role.call_args_list]
+        assert len(checkers) == len(set(checkers))
+
+    def test_wrapped_once(self):
+        for cls in (BaseReportViewSet, UserReportViewSet, OtherReportViewSet):
+            for name in ('list', 'check_permissions', 'handle_exception', 'finalize_response'):
+                method = cls.__dict__[name]
+                assert method._rfr_class is cls
+                assert not hasattr(method._rfr_original, '_rfr_class')
+
+    def test_inherited_permissions_compiled_once(self):
+        plan = plans.current_plan()
+        assert plan.views[OtherReportViewSet] is plan.views[BaseReportViewSet]
+        assert plan.views[UserReportViewSet] is not plan.views[BaseReportViewSet]
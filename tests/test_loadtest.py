@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from benchmarks import loadtest
+
+
+def test_percentile():
+    values = [i / 1000 for i in range(1, 101)]
+    assert loadtest.percentile(values, 50) == 0.05
+    assert loadtest.percentile(values, 99) == 0.099
+    assert loadtest.percentile([], 99) == 0.0
+
+
+def test_summarize():
+    summary = loadtest.summarize([0.002, 0.001, 0.003, 0.004], 2.0, {200: 4})
+    assert summary['requests'] == 4
+    assert summary['throughput'] == 2.0
+    assert summary['p50'] == 2.0
+    assert summary['p99'] == 4.0
+
+
+@pytest.mark.parametrize("concurrency", ({'threads': 2}, {'threads': 1, 'tasks': 2}))
+def test_compare_patched_and_unpatched(concurrency):
+    results = loadtest.compare(loadtest.DEFAULT_PATHS, loadtest.DEFAULT_ROLE, requests=20, **concurrency)
+    assert results['unpatched']['statuses'] == results['patched']['statuses'] == {'200': 20}
+    for result in results.values():
+        assert result['requests'] == 20
+        assert result['throughput'] > 0
+        assert 0 < result['p50'] <= result['p95'] <= result['p99']
+    out = io.StringIO()
+    loadtest.report(results, out)
+    header = out.getvalue().splitlines()[0]
+    assert all(column in header for column in ('req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    assert 'overhead at p50' in out.getvalue()
+
+
+def test_report_refuses_different_statuses():
+    summary = loadtest.summarize([0.001], 1.0, {200: 1})
+    out = io.StringIO()
+    loadtest.report({'unpatched': summary, 'patched': {**summary, 'statuses': {403: 1}}}, out)
+    assert 'statuses differ' in out.getvalue()
+    assert 'overhead at p50' not in out.getvalue()
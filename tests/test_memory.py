@@ -0,0 +1,29 @@
+import io
+import os
+
+import pytest
+
+from benchmarks import memory
+
+
+SMAPS = """\
+Rss:               30000 kB
+Pss:               12000 kB
+Private_Clean:       100 kB
+Private_Dirty:      2900 kB
+Referenced:        30000 kB
+"""
+
+
+def test_parse_uss():
+    assert memory.parse_uss(SMAPS) == 3000
+
+
+@pytest.mark.skipif(not os.path.exists(memory.SMAPS), reason="Needs /proc/self/smaps_rollup")
+def test_compare_unfrozen_and_frozen():
+    results = memory.compare(['/rest_class_viewset'], 'admin', workers=2, requests=20)
+    assert results['unfrozen']['workers'] == 2
+    assert results['frozen']['after_requests'] > 0
+    out = io.StringIO()
+    memory.report(results, out)
+    assert 'saved per worker' in out.getvalue()
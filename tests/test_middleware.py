@@ -0,0 +1,124 @@
+import sys
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import path, include
+from django.views import View
+
+import rest_framework as drf
+import rest_framework.exceptions
+import rest_framework.routers
+import rest_framework.views
+import rest_framework.viewsets
+
+from rest_framework_roles import patching
+from rest_framework_roles.middleware import EarlyDenyMiddleware
+from rest_framework_roles.granting import is_self
+from .fixtures import admin, user, anon
+from .utils import UserSerializer
+
+
+class UserViewSet(drf.viewsets.ModelViewSet):
+    serializer_class = UserSerializer
+    queryset = User.objects.all()
+    view_permissions = {
+        'list': {'admin': True},
+        'retrieve': {'user': is_self, 'anon': drf.exceptions.NotAuthenticated},
+        'create': {'anon': True},
+    }
+
+
+class StatusView(drf.views.APIView):
+    view_permissions = {'get': {'user': True}}
+
+    def get(self, request):
+        return HttpResponse()
+
+    def post(self, request):
+        return HttpResponse()
+
+
+class DjangoStatusView(View):
+    view_permissions = {'get': {'user': True}}
+
+    def get(self, request):
+        return HttpResponse()
+
+
+router = drf.routers.DefaultRouter()
+router.register(r'users', UserViewSet, basename='user')
+urlpatterns = [
+    path('', include(router.urls)),
+    path('status/', StatusView.as_view()),
+    path('django_status/', DjangoStatusView.as_view()),
+]
+
+MIDDLEWARE = 'rest_framework_roles.middleware.EarlyDenyMiddleware'
+
+CASES = [
+    # method, url, expected status
+    ('get', '/users/', 403),
+    ('get', '/users/1/', 403),  # NotAuthenticated ends up 403 without authenticate header
+    ('post', '/users/', 400),  # granted; invalid data
+    ('delete', '/users/1/', 403),  # not in view_permissions
+    ('get', '/status/', 403),
+    ('post', '/status/', 403),  # not in view_permissions
+    ('put', '/status/', 405),
+]
+
+
+@pytest.mark.urls(__name__)
+class TestEarlyDenyMiddleware:
+
+    def setup(self):
+        patching.patch()
+
+    @pytest.fixture
+    def early_deny(self, settings):
+        settings.MIDDLEWARE = [*settings.MIDDLEWARE, MIDDLEWARE]
+
+    @pytest.mark.parametrize("method,url,expected_status", CASES)
+    def test_same_response_as_view(self, method, url, expected_status, client, db, settings):
+        response = getattr(client, method)(url)
+        assert response.status_code == expected_status
+
+        settings.MIDDLEWARE = [*settings.MIDDLEWARE, MIDDLEWARE]
+        early_response = getattr(client, method)(url)
+        assert early_response.status_code == response.status_code
+        assert early_response.content == response.content
+
+    def test_view_never_runs(self, client, early_deny, anon):
+        with patch.object(UserViewSet, 'initial') as mocked_initial:
+            response = client.get('/users/')
+        assert response.status_code == 403
+        assert not mocked_initial.called
+
+    def test_authenticated_go_through(self, client, early_deny, admin):
+        client.force_login(admin)
+        with patch('rest_framework_roles.middleware.EarlyDenyMiddleware.deny_early') as mocked:
+            response = client.get('/users/')
+        assert response.status_code == 200
+        assert not mocked.called
+
+    def test_django_views_go_through(self, client, early_deny, anon):
+        with patch.object(DjangoStatusView, 'get', return_value=HttpResponse()) as mocked_get:
+            client.get('/django_status/')
+        assert mocked_get.called
+
+    def test_credentials_go_through(self, client, early_deny, anon):
+        with patch.object(UserViewSet, 'initial', side_effect=drf.exceptions.AuthenticationFailed) as mocked_initial:
+            client.get('/users/', HTTP_AUTHORIZATION='Token abc')
+        assert mocked_initial.called
+
+
+def test_urlconf_of_request(anon):
+    patching.patch(sys.modules[__name__])
+    request = RequestFactory().get('/users/')
+    request.user = anon
+    middleware = EarlyDenyMiddleware(lambda request: HttpResponse())
+    assert middleware.deny_early(request) is None  # Not in ROOT_URLCONF
+    request.urlconf = __name__
+    assert middleware.deny_early(request).status_code == 403
@@ -1,9 +1,12 @@
+from unittest.mock import patch
+
 import pytest
 
 from rest_framework_roles.roles import is_admin, is_user, is_anon
 from rest_framework_roles.parsing import parse_roles, parse_view_permissions, get_permission_list
+from rest_framework_roles.parsing import RoleRegistry, get_role_registry
 from rest_framework_roles.decorators import role_checker
-from rest_framework_roles.granting import allof, anyof
+from rest_framework_roles.granting import allof, anyof, is_self, is_self_object
 
 
 def test_parse_roles():
@@ -171,4 +174,53 @@ def test_hashing_permissions(samehash, p1, p2):
     if samehash:
         assert hash(perm1) == hash(perm2)
     else:
-        assert hash(perm1) != hash(perm2)
\ No newline at end of file
+        assert hash(perm1) != hash(perm2)
+
+
+def test_identical_rules_are_shared():
+    roles = {'admin': is_admin, 'user': is_user}
+    lookup1 = parse_view_permissions({'list': {'admin': True, 'user': False}}, roles)
+    lookup2 = parse_view_permissions({'list,retrieve': {'admin': True, 'user': False}}, roles)
+    assert lookup1['list'] is lookup2['list']
+    assert lookup2['retrieve'] is lookup2['list']
+    assert lookup1['list'][0] is lookup2['list'][0]
+
+
+def test_rules_are_compact():
+    lookup = parse_view_permissions({'list': {'admin': anyof(is_self, is_self_object)}}, {'admin': is_admin})
+    rule = lookup['list'][0]
+    assert rule == (anyof(is_self, is_self_object), is_admin)
+    assert rule.granted is anyof(is_self, is_self_object)
+    assert rule.role_checker is is_admin
+    assert not hasattr(rule, '__dict__')
+    assert not hasattr(rule.granted, '__dict__')
+
+
+def test_role_registry():
+    def is_owner(request, view):
+        pass
+
+    registry = RoleRegistry({'admin': is_admin, 'owner': is_owner})
+    assert [role.name for role in registry] == ['admin', 'owner']
+    assert registry['admin'].id == 0
+    assert registry['owner'].id == 1
+    assert registry['owner'].checker is is_owner
+    assert registry['owner'].cost == 0
+    assert registry.by_checker(is_owner) is registry['owner']
+    assert registry.by_checker(is_user) is None
+    assert 'owner' in registry
+    assert 'user' not in registry
+    assert not hasattr(is_owner, 'cost')  # user's function left untouched
+    with pytest.raises(AttributeError):
+        registry.x = 1
+    with pytest.raises(TypeError):
+        registry._roles['user'] = is_user
+
+
+def test_role_registry_loaded_once():
+    get_role_registry.cache_clear()
+    with patch('rest_framework_roles.parsing.load_roles', return_value={'admin': is_admin}) as mocked:
+        parse_view_permissions({'list': {'admin': True}})
+        parse_view_permissions({'create': {'admin': False}})
+    assert mocked.call_count == 1
+    get_role_registry.cache_clear()
@@ -11,7 +11,7 @@ from rest_framework_roles.roles import is_admin, is_user, is_anon
 from rest_framework_roles.granting import is_self, anyof, allof
 from rest_framework_roles.exceptions import Misconfigured
 from rest_framework_roles import patching
-from .fixtures import admin, user, anon
+from .fixtures import admin, user, anon, request_factory
 from .utils import assert_allowed, assert_disallowed, UserSerializer, get_response
 
 
@@ -343,4 +343,37 @@ class TestGroupedPermissions:
         assert mocked_check_role_permissions.call_count == 2
 
         # BUT the 3nd time we expect the checking to have been bypassed
-        assert _mocked_check_role_permissions.call_count == 1
\ No newline at end of file
+        assert _mocked_check_role_permissions.call_count == 1
+
+
+class TestPermissionContext:
+
+    def test_role_checked_once_per_request(self, request_factory):
+        from rest_framework_roles.permissions import check_role_permissions, get_context
+        from rest_framework_roles.parsing import parse_view_permissions
+
+        calls = []
+        def is_counted(request, view):
+            calls.append(view)
+            return True
+
+        def retrieve(self, request):
+            pass
+        def me(self, request):
+            pass
+
+        lookup = parse_view_permissions({'retrieve': {'counted': False}, 'me': {'counted': True}}, {'counted': is_counted})
+        request = request_factory.get('/')
+        assert not check_role_permissions(request, retrieve, None, lookup['retrieve'])
+        assert check_role_permissions(request, me, None, lookup['me'])
+        assert len(calls) == 1
+
+        context = get_context(request)
+        assert context.views_checked == (retrieve, me)
+        assert context.granted == (id(lookup['me']),)
+
+    def test_context_not_shared_between_requests(self, request_factory):
+        from rest_framework_roles.permissions import get_context
+        request1, request2 = request_factory.get('/'), request_factory.get('/')
+        assert get_context(request1) is get_context(request1)
+        assert get_context(request1) is not get_context(request2)
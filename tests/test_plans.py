@@ -0,0 +1,130 @@
+from unittest.mock import MagicMock
+
+import pytest
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.viewsets
+
+from rest_framework_roles import patching, plans
+from rest_framework_roles.granting import allof, is_self
+from rest_framework_roles.roles import is_admin
+from rest_framework_roles.permissions import get_plan
+from .fixtures import admin, user, anon, request_factory
+from .utils import assert_allowed, assert_disallowed
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    view_permissions = {'list': {'admin': True}}
+
+    def list(self, request):
+        return HttpResponse()
+
+    def create(self, request):
+        return HttpResponse()
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list', 'post': 'create'})),
+]
+
+
+@pytest.mark.urls(__name__)
+class TestReload:
+
+    def setup(self):
+        patching.patch()
+
+    def teardown(self):
+        ReportViewSet.view_permissions = {'list': {'admin': True}}
+
+    def test_plan_installed(self):
+        plan = plans.current_plan()
+        assert plan.views[ReportViewSet]['list'] is ReportViewSet._view_permissions['list']
+        with pytest.raises(AttributeError):
+            plan.exception_class = Exception
+        with pytest.raises(TypeError):
+            plan.views[ReportViewSet]['create'] = ()
+
+    def test_reload_rules(self, user, admin):
+        assert_disallowed(user, get='/reports/')
+        assert_disallowed(admin, post='/reports/')
+
+        ReportViewSet.view_permissions = {'list': {'user': True}, 'create': {'admin': True}}
+        patching.reload()
+
+        assert_allowed(user, get='/reports/')
+        assert_allowed(admin, post='/reports/')
+        assert ReportViewSet._view_permissions is plans.current_plan().views[ReportViewSet]
+
+        ReportViewSet.view_permissions = {'list': {'user': True}}
+        patching.reload()
+        assert_disallowed(admin, post='/reports/')
+
+    def test_reload_exception_class(self, user, settings):
+        assert_disallowed(user, get='/reports/', expected_status=(403,))
+        settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'DEFAULT_EXCEPTION_CLASS': 'rest_framework.exceptions.NotFound'}
+        patching.reload()
+        assert_disallowed(user, get='/reports/', expected_status=(404,))
+
+    def test_handlers_wrapped_once(self):
+        handler = ReportViewSet.list
+        check_permissions = ReportViewSet.check_permissions
+        patching.reload()
+        patching.patch()
+        assert ReportViewSet.list is handler
+        assert ReportViewSet.check_permissions is check_permissions
+
+    def test_request_keeps_its_plan(self, request_factory):
+        request = request_factory.get('/reports/')
+        old_plan = get_plan(request)
+        patching.reload()
+        assert plans.current_plan() is not old_plan
+        assert get_plan(request) is old_plan
+
+
+class TestVersion:
+
+    def test_same_for_same_contents(self):
+        lookup = {'list': ((True, is_admin),)}
+        plan = plans.PermissionPlan({ReportViewSet: lookup}, drf.exceptions.PermissionDenied)
+        assert plan.version == plans.PermissionPlan({ReportViewSet: dict(lookup)}, drf.exceptions.PermissionDenied).version
+        assert plan.version == plans.compact(plan).version
+
+    def test_changes_with_contents(self):
+        lookup = {'list': ((True, is_admin),)}
+        plan = plans.PermissionPlan({ReportViewSet: lookup}, drf.exceptions.PermissionDenied)
+        assert plan.version != plans.PermissionPlan({ReportViewSet: lookup}, drf.exceptions.NotFound).version
+        assert plan.version != plans.PermissionPlan({ReportViewSet: {'list': ((False, is_admin),)}}, drf.exceptions.PermissionDenied).version
+        assert plan.version != plans.PermissionPlan({ReportViewSet: {'list': ((allof(is_self, True), is_admin),)}}, drf.exceptions.PermissionDenied).version
+
+
+class TestFreeze:
+
+    def test_equal_permissions_shared(self):
+        lookup = {'list': (), 'create': ()}
+        plan = plans.compact(plans.PermissionPlan({ReportViewSet: dict(lookup), drf.viewsets.ViewSet: dict(lookup)}, None))
+        assert plan.views[ReportViewSet] is plan.views[drf.viewsets.ViewSet]
+        assert plan.views[ReportViewSet] == lookup
+
+    @pytest.mark.urls(__name__)
+    def test_freeze_installs_compact_plan(self, monkeypatch, user, admin):
+        patching.patch()
+        frozen = MagicMock()
+        monkeypatch.setattr(patching.gc, 'freeze', frozen)
+        old_plan = plans.current_plan()
+        patching.freeze(gc_freeze=True)
+        assert plans.current_plan() is not old_plan
+        assert ReportViewSet._view_permissions is plans.current_plan().views[ReportViewSet]
+        assert frozen.called
+        assert_disallowed(user, get='/reports/')
+        assert_allowed(admin, get='/reports/')
+
+
+def test_default_permission_denies_without_any_patterns(request_factory):
+    urlconf = MagicMock()
+    urlconf.urlpatterns = []
+    patching.patch(urlconf)
+    with pytest.raises(drf.exceptions.PermissionDenied):
+        patching.DefaultPermission().has_permission(request_factory.get('/'), None)
@@ -0,0 +1,164 @@
+import pytest
+from django.core import signing
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.viewsets
+
+from rest_framework_roles import patching, role_sets
+from rest_framework_roles.db.roles import assign_role, stored_role, RoleSnapshot
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.roles import is_anon, is_user
+from rest_framework_roles.throttling import RoleRateThrottle
+from .fixtures import user
+
+
+EDITORS = set()
+
+
+def is_editor(request, view):
+    is_editor.calls += 1
+    return request.user.pk in EDITORS
+is_editor.calls = 0
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    view_permissions = {'list': {'editor': True}}
+
+    def list(self, request):
+        return HttpResponse()
+
+
+class ThrottledReportViewSet(ReportViewSet):
+    throttle_classes = [RoleRateThrottle]
+    view_throttle_rates = {'editor': '100/min'}
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list'})),
+    path('throttled_reports/', ThrottledReportViewSet.as_view({'get': 'list'})),
+]
+
+ROLES = {
+    'anon': is_anon,
+    'user': is_user,
+    'editor': is_editor,
+}
+
+
+@pytest.fixture
+def enable(settings, monkeypatch, tmp_path):
+    monkeypatch.setattr(role_sets, 'SETTLE_TIME', 0)
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(tmp_path / 'cache'),
+    }}
+    EDITORS.clear()
+
+    def enable(store):
+        settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'ROLE_SETS': store}
+        patching.patch(roleconfig=ROLES)
+    yield enable
+    role_sets.load({})
+
+
+def get(client, url='/reports/'):
+    calls = is_editor.calls
+    status = client.get(url).status_code
+    return status, is_editor.calls - calls
+
+
+@pytest.mark.urls(__name__)
+class TestSessionRoleSets():
+
+    def test_computed_at_login(self, enable, client, user):
+        enable('session')
+        EDITORS.add(user.pk)
+        client.force_login(user)
+        assert client.session[role_sets.SESSION_KEY]['roles'] == ['user', 'editor']
+        assert get(client) == (200, 0)
+
+    def test_invalidated(self, enable, client, user):
+        enable('session')
+        client.force_login(user)
+        assert get(client) == (403, 0)
+        EDITORS.add(user.pk)
+        role_sets.invalidate(user)
+        assert get(client) == (200, 1)
+        assert get(client) == (200, 0)
+        role_sets.invalidate()
+        assert get(client) == (200, 1)
+
+    def test_not_stored_until_settled(self, enable, client, user, monkeypatch):
+        enable('session')
+        monkeypatch.setattr(role_sets, 'SETTLE_TIME', 60)
+        client.force_login(user)
+        assert role_sets.SESSION_KEY not in client.session
+        assert get(client) == (403, 1)
+        assert get(client) == (403, 1)
+
+    def test_stored_roles_invalidate(self, enable, client, user):
+        snapshot = RoleSnapshot(refresh_interval=0)
+        ROLES['partner'] = stored_role('partner', snapshot)
+        try:
+            enable('session')
+            client.force_login(user)
+            assert 'partner' not in client.session[role_sets.SESSION_KEY]['roles']
+            assign_role(user, 'partner')
+            get(client)
+            assert 'partner' in client.session[role_sets.SESSION_KEY]['roles']
+        finally:
+            del ROLES['partner']
+
+    def test_anon_not_stored(self, enable, client, db):
+        enable('session')
+        assert get(client) == (403, 1)
+
+    def test_used_when_throttled(self, enable, client, user):
+        enable('session')
+        EDITORS.add(user.pk)
+        client.force_login(user)
+        assert get(client, '/throttled_reports/') == (200, 0)
+
+    def test_needs_shared_cache(self, enable, settings):
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with pytest.raises(Misconfigured):
+            enable('session')
+
+
+@pytest.mark.urls(__name__)
+class TestCookieRoleSets():
+
+    @pytest.fixture
+    def middleware(self, settings):
+        settings.MIDDLEWARE = (*settings.MIDDLEWARE, role_sets.MIDDLEWARE_PATH)
+
+    def test_needs_middleware(self, enable):
+        with pytest.raises(Misconfigured):
+            enable('cookie')
+
+    def test_cookie_used(self, middleware, enable, client, user):
+        enable('cookie')
+        EDITORS.add(user.pk)
+        client.force_login(user)  # Has no response to set the cookie on
+        assert get(client) == (200, 1)
+        assert role_sets.COOKIE_NAME in client.cookies
+        assert get(client) == (200, 0)
+
+    def test_tampered_cookie_ignored(self, middleware, enable, client, user):
+        enable('cookie')
+        client.force_login(user)
+        version = list(role_sets.get_version(user.pk))
+        forged = {'user': str(user.pk), 'tenant': '', 'version': version, 'roles': ['editor']}
+        client.cookies[role_sets.COOKIE_NAME] = signing.dumps(forged, salt='other')
+        assert get(client) == (403, 1)
+
+    def test_cookie_of_other_user_ignored(self, middleware, enable, client, user, django_user_model):
+        enable('cookie')
+        other = django_user_model.objects.create(username='other')
+        EDITORS.add(other.pk)
+        client.force_login(other)
+        get(client)
+        client.force_login(user)
+        assert get(client) == (403, 1)
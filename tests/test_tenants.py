@@ -0,0 +1,77 @@
+import pytest
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_roles.authorization import authorize, make_request
+from rest_framework_roles.db.roles import RoleSnapshot, stored_role, assign_role, revoke_role
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.parsing import get_tenant_resolver
+from rest_framework_roles.permissions import get_tenant
+from rest_framework_roles.views import PermissionsView
+from rest_framework_roles import plans
+from .fixtures import user
+
+
+def tenant_from_header(request):
+    tenant_from_header.calls += 1
+    return request.META.get('HTTP_X_TENANT')
+tenant_from_header.calls = 0
+
+
+def make_tenant_request(user, tenant):
+    request = APIRequestFactory().get('/', HTTP_X_TENANT=tenant)
+    request.user = user
+    return request
+
+
+@pytest.fixture
+def tenant_settings(settings):
+    settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'TENANT_RESOLVER': 'tests.test_tenants.tenant_from_header'}
+    get_tenant_resolver.cache_clear()
+    yield settings
+    get_tenant_resolver.cache_clear()
+
+
+def test_no_tenant_by_default(user):
+    get_tenant_resolver.cache_clear()
+    assert get_tenant(make_tenant_request(user, 'a')) is None
+
+
+def test_tenant_resolved_once_per_request(tenant_settings, user):
+    request = make_tenant_request(user, 'a')
+    calls = tenant_from_header.calls
+    assert get_tenant(request) == 'a'
+    assert get_tenant(request) == 'a'
+    assert tenant_from_header.calls == calls + 1
+
+
+def test_resolver_must_be_callable(settings):
+    settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'TENANT_RESOLVER': 42}
+    get_tenant_resolver.cache_clear()
+    with pytest.raises(Misconfigured):
+        get_tenant_resolver()
+
+
+def test_stored_roles_scoped_to_tenant(tenant_settings, user):
+    snapshot = RoleSnapshot(refresh_interval=0)
+    is_partner = stored_role('partner', snapshot)
+    assign_role(user, 'partner', tenant='a')
+    assert is_partner(make_tenant_request(user, 'a'), None)
+    assert not is_partner(make_tenant_request(user, 'b'), None)
+    assert not is_partner(make_tenant_request(user, None), None)
+
+    assign_role(user, 'partner', tenant='b')
+    revoke_role(user, 'partner', tenant='a')
+    assert not is_partner(make_tenant_request(user, 'a'), None)
+    assert is_partner(make_tenant_request(user, 'b'), None)
+
+
+def test_batch_authorization_keeps_tenant(tenant_settings, user):
+    assert get_tenant(make_request(make_tenant_request(user, 'a'))) == 'a'
+    assert get_tenant(make_request(user, tenant='b')) == 'b'
+    assert authorize(user, [], tenant='b') == {}
+
+
+def test_permissions_cached_per_tenant():
+    view = PermissionsView()
+    plan = plans.current_plan()
+    assert view.get_cache_key({'user'}, plan, 'a') != view.get_cache_key({'user'}, plan, 'b')
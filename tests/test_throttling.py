@@ -0,0 +1,79 @@
+import pytest
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.viewsets
+
+from rest_framework_roles import patching
+from rest_framework_roles.throttling import RoleRateThrottle, InMemoryThrottleStore, CacheThrottleStore, parse_rate
+from .fixtures import admin, user, anon
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    throttle_classes = [RoleRateThrottle]
+    view_permissions = {'list': {'admin': True, 'user': True, 'anon': True}}
+    view_throttle_rates = {'anon': '1/min', 'user': '2/min'}
+
+    def list(self, request):
+        return HttpResponse()
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list'})),
+]
+
+
+def test_parse_rate():
+    assert parse_rate('10/min') == (10, 60)
+    assert parse_rate('1/s') == (1, 1)
+    assert parse_rate('5/day') == (5, 86400)
+
+
+@pytest.mark.parametrize("store", [InMemoryThrottleStore(), CacheThrottleStore()])
+def test_store_sliding_window(store):
+    assert store.hit('key', 2, 60, now=1000) is None
+    assert store.hit('key', 2, 60, now=1010) is None
+    assert store.hit('key', 2, 60, now=1020) == 40
+    assert store.hit('other', 2, 60, now=1020) is None
+    assert store.hit('key', 2, 60, now=1061) is None
+
+
+def test_in_memory_store_forgets_idle_keys():
+    store = InMemoryThrottleStore()
+    store.SWEEP_EVERY = 2
+    store.hit('idle', 1, 60, now=0)
+    store.hit('busy', 1, 60, now=100)
+    assert set(store._history) == {'busy'}
+
+
+@pytest.mark.urls(__name__)
+class TestRoleRateThrottle:
+
+    def setup(self):
+        patching.patch()
+        RoleRateThrottle.store.clear()
+
+    def test_rate_per_role(self, client, user, anon, admin):
+        assert client.get('/reports/').status_code == 200
+        assert client.get('/reports/').status_code == 429
+
+        client.force_authenticate(user)
+        assert client.get('/reports/').status_code == 200
+        assert client.get('/reports/').status_code == 200
+        assert client.get('/reports/').status_code == 429
+
+        client.force_authenticate(admin)  # No rate for admin
+        for _ in range(5):
+            assert client.get('/reports/').status_code == 200
+
+    def test_role_checked_once(self, client, user):
+        from rest_framework_roles.roles import is_user
+        client.force_authenticate(user)
+        calls = []
+        def is_counted_user(request, view):
+            calls.append(view)
+            return is_user(request, view)
+        patching.patch(roleconfig={'admin': lambda r, v: False, 'user': is_counted_user, 'anon': lambda r, v: False})
+        assert client.get('/reports/').status_code == 200
+        assert len(calls) == 1
@@ -0,0 +1,99 @@
+import pytest
+from django.http import HttpResponse
+from django.urls import path
+
+import rest_framework as drf
+import rest_framework.viewsets
+
+from rest_framework_roles import patching, tracing
+from rest_framework_roles.exceptions import Misconfigured
+from rest_framework_roles.granting import anyof
+from .fixtures import user, anon
+from .utils import assert_allowed, assert_disallowed
+
+
+def is_weekday(request, view):
+    return True
+
+
+def is_manager(request, view):
+    return False
+
+
+class ReportViewSet(drf.viewsets.ViewSet):
+    view_permissions = {
+        'list': {'admin': False, 'user': anyof(is_manager, is_weekday)},
+    }
+
+    def list(self, request):
+        return HttpResponse()
+
+
+urlpatterns = [
+    path('reports/', ReportViewSet.as_view({'get': 'list'})),
+]
+
+
+@pytest.mark.urls(__name__)
+class TestTracing:
+
+    def setup(self):
+        patching.patch()
+        self.exporter = tracing.InMemoryExporter()
+        tracing.set_exporter(self.exporter)
+
+    def teardown(self):
+        tracing.set_exporter(None)
+
+    def test_spans_of_granted_request(self, user):
+        assert_allowed(user, get='/reports/')
+        spans = {span.name: span for span in self.exporter.spans}
+        assert [span.name for span in self.exporter.spans] == [
+            'rfr.matches_role',
+            'rfr.matches_role',
+            'rfr.grant_checker',
+            'rfr.check_role_permissions',
+        ]
+        check = spans['rfr.check_role_permissions']
+        assert check.parent is None
+        assert check.attributes['outcome'] == 'True'
+        assert check.attributes['duration_ms'] >= 0
+
+        admin_role, user_role = self.exporter.spans[:2]
+        assert admin_role.parent is check
+        assert admin_role.attributes['role'] == 'admin'
+        assert admin_role.attributes['outcome'] is False
+        assert user_role.attributes['role'] == 'user'
+        assert user_role.attributes['outcome'] is True
+        assert 'cost' in user_role.attributes
+
+        grant = spans['rfr.grant_checker']
+        assert grant.parent is check
+        assert grant.attributes['scheme'] == 'any'
+        assert grant.attributes['outcome'] is True
+
+    def test_spans_of_denied_request(self, anon):
+        assert_disallowed(anon, get='/reports/')
+        check = self.exporter.spans[-1]
+        assert check.name == 'rfr.check_role_permissions'
+        assert check.attributes['outcome'] == 'None'  # No role matched
+
+    def test_no_spans_when_off(self, user):
+        tracing.set_exporter(None)
+        assert_allowed(user, get='/reports/')
+        assert not self.exporter.spans
+
+
+def test_tracing_setting(settings):
+    settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'TRACING': 'memory'}
+    patching.post_patch()
+    assert isinstance(tracing.exporter, tracing.InMemoryExporter)
+
+    settings.REST_FRAMEWORK_ROLES = {**settings.REST_FRAMEWORK_ROLES, 'TRACING': False}
+    patching.post_patch()
+    assert tracing.exporter is None
+
+
+def test_invalid_exporter():
+    with pytest.raises(Misconfigured):
+        tracing.load_exporter({'TRACING': 'rest_framework_roles.tracing.EXPORTERS'})
@@ -0,0 +1,96 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import path, include
+
+import rest_framework as drf
+import rest_framework.routers
+import rest_framework.views
+import rest_framework.viewsets
+
+from rest_framework_roles import patching, plans
+from rest_framework_roles.granting import is_self
+from rest_framework_roles.roles import is_admin, is_anon, is_user
+from rest_framework_roles.views import PermissionsView
+from .fixtures import admin, user, anon
+from .utils import UserSerializer
+
+
+class UserViewSet(drf.viewsets.ModelViewSet):
+    serializer_class = UserSerializer
+    queryset = User.objects.all()
+    view_permissions = {
+        'list': {'admin': True},
+        'retrieve': {'user': is_self, 'admin': True},
+        'create': {'anon': True},
+    }
+
+
+class StatusView(drf.views.APIView):
+    view_permissions = {'get': {'user': True}}
+
+    def get(self, request):
+        return HttpResponse()
+
+
+router = drf.routers.SimpleRouter()
+router.register(r'users', UserViewSet, basename='user')
+urlpatterns = [
+    path('api/', include(router.urls)),
+    path('status/', StatusView.as_view(), name='status'),
+    path('permissions/', PermissionsView.as_view()),
+]
+
+
+@pytest.mark.urls(__name__)
+class TestPermissionsView:
+
+    def setup(self):
+        patching.patch()
+        cache.clear()
+
+    def test_lists_allowed_actions(self, client, user, anon):
+        client.force_authenticate(user)
+        resp = client.get('/permissions/')
+        assert resp.status_code == 200
+        assert resp.json() == {'endpoints': [
+            {'route': 'api/^users/(?P<pk>[^/.]+)/$', 'name': 'user-detail', 'actions': {'get': None}},
+            {'route': 'status/', 'name': 'status', 'actions': {'get': True}},
+        ]}
+
+        client.force_authenticate(None)
+        resp = client.get('/permissions/')
+        assert resp.json() == {'endpoints': [
+            {'route': 'api/^users/$', 'name': 'user-list', 'actions': {'post': True}},
+        ]}
+
+    def test_cached_per_role_set(self, client, user):
+        from unittest.mock import patch
+        client.force_authenticate(user)
+        etag = client.get('/permissions/')['ETag']
+
+        client.force_authenticate(User.objects.create(username='otheruser'))
+        with patch('rest_framework_roles.authorization.authorize_request') as mocked:
+            resp = client.get('/permissions/')
+        assert not mocked.called
+        assert resp['ETag'] == etag
+
+    def test_etag(self, client, user, admin):
+        client.force_authenticate(user)
+        etag = client.get('/permissions/')['ETag']
+        resp = client.get('/permissions/', HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+        assert not resp.content
+
+        client.force_authenticate(admin)
+        resp = client.get('/permissions/', HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+        assert resp['ETag'] != etag
+
+    def test_roles_of_plan(self, client, user):
+        patching.patch(roleconfig={'admin': is_admin, 'user': is_user, 'anon': is_anon, 'member': is_user})
+        client.force_authenticate(user)
+        assert client.get('/permissions/').status_code == 200
+        cache_key = PermissionsView().get_cache_key({'user', 'member'}, plans.current_plan(), None)
+        assert cache.get(cache_key) is not None